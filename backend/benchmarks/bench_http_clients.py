@@ -0,0 +1,87 @@
+"""
+HTTP Client Overhead Benchmark
+==============================
+Measures per-call overhead of OllamaProvider against a local stub LLM server,
+comparing a fresh HTTP client per call (the old behaviour) with the shared,
+pooled client.
+
+Run from backend/:
+    python benchmarks/bench_http_clients.py --calls 500 --concurrency 1 8
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from cass.core.llm import LlmMessage, Role  # noqa: E402
+from cass.integrations.llm.ollama import OllamaProvider  # noqa: E402
+
+from stub_llm import StubConfig, StubLlmServer  # noqa: E402
+
+MESSAGES = [LlmMessage(role=Role.USER, content="How many customers are there?")]
+
+
+async def _run(url: str, shared: OllamaProvider | None, calls: int, concurrency: int) -> list[float]:
+    latencies: list[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            if shared is not None:
+                await shared.chat(MESSAGES)
+            else:
+                # A throwaway provider per call reproduces the old
+                # `async with httpx.AsyncClient()` per request
+                provider = OllamaProvider(base_url=url, model="stub")
+                await provider.chat(MESSAGES)
+                await provider.aclose()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return latencies
+
+
+def _report(label: str, latencies: list[float], elapsed: float, connections: int) -> None:
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"  {label:<16} mean {statistics.mean(latencies):7.3f} ms  "
+        f"p50 {statistics.median(latencies):7.3f} ms  p95 {p95:7.3f} ms  "
+        f"{len(latencies) / elapsed:8.0f} calls/s  {connections:5d} TCP connections"
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    server = StubLlmServer(StubConfig(latency_ms=args.latency_ms))
+    await server.start()
+    try:
+        for concurrency in args.concurrency:
+            print(f"concurrency={concurrency}, calls={args.calls}, stub latency={args.latency_ms} ms")
+            for label, shared in (
+                ("per-call client", None),
+                ("shared client", OllamaProvider(base_url=server.url, model="stub")),
+            ):
+                await _run(server.url, shared, min(20, args.calls), concurrency)  # warm-up
+                server.connections = 0
+                started = time.perf_counter()
+                latencies = await _run(server.url, shared, args.calls, concurrency)
+                elapsed = time.perf_counter() - started
+                if shared is not None:
+                    await shared.aclose()
+                _report(label, latencies, elapsed, server.connections)
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,131 @@
+"""
+Serialization Benchmark
+=======================
+Events/sec for SSE token frames and rows/sec for JSON responses: the
+previous encoding path next to the current one (cass.server.serialization).
+
+- SSE tokens: json.dumps of the whole event dict per token vs. the
+  pre-encoded frame template (token_event)
+- Rows: what /chat did (response model, pydantic JSON), what /sql did
+  (FastAPI's jsonable_encoder + JSONResponse), json.dumps with json_default,
+  and FastJSONResponse
+
+Rows hold the values asyncpg returns: ints, text, Decimal, datetime, date,
+UUID. Results depend on whether orjson is installed (printed at the top).
+
+Run from backend/:
+    python benchmarks/bench_serialization.py --rows 10000 --tokens 20000
+"""
+
+import argparse
+import datetime
+import decimal
+import json
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from cass.server.app import ChatResponse  # noqa: E402
+from cass.server.serialization import FastJSONResponse, json_default, orjson_available  # noqa: E402
+from cass.server.streaming import token_event  # noqa: E402
+
+
+def synthetic_rows(rows: int) -> list[dict[str, Any]]:
+    """Rows shaped like an orders query."""
+    base = datetime.datetime(2024, 1, 1, 9, 30)
+    return [
+        {
+            "id": r,
+            "customer": f"Customer {r % 997}",
+            "status": ("pending", "shipped", "delivered")[r % 3],
+            "total": decimal.Decimal(r * 37 % 100_000) / 100,
+            "ordered_at": base + datetime.timedelta(minutes=r),
+            "ship_date": (base + datetime.timedelta(days=r % 30)).date(),
+            "tracking": uuid.UUID(int=r * 7919),
+        }
+        for r in range(rows)
+    ]
+
+
+def synthetic_tokens(count: int) -> list[str]:
+    """Short LLM tokens, some with quotes, newlines and non-ASCII text."""
+    vocabulary = [
+        "SELECT", " c", ".name", ",", " SUM", "(o", ".total", ")", " FROM", " orders",
+        " o", "\n", "```", "sql", " WHERE", " status", " =", " '", "shipped", "'",
+        " \"quoted\"", " café", " ✓", " -", " 1", "0", "%",
+    ]
+    return [vocabulary[i % len(vocabulary)] for i in range(count)]
+
+
+def _rate(fn: Callable[[], object], items: int, repeat: int) -> float:
+    """Best-of-repeat items per second."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return items / best
+
+
+def _report(label: str, rate: float, baseline: float, unit: str) -> None:
+    print(f"  {label:<50} {rate:14,.0f} {unit}/s  ({rate / baseline:5.1f}x)")
+
+
+def bench_events(tokens: list[str], repeat: int) -> None:
+    print(f"SSE token events, {len(tokens)} tokens")
+
+    def previous() -> None:
+        for token in tokens:
+            f"data: {json.dumps({'type': 'token', 'content': token})}\n\n"
+
+    def current() -> None:
+        for token in tokens:
+            token_event(token)
+
+    baseline = _rate(previous, len(tokens), repeat)
+    _report("json.dumps per event (previous)", baseline, baseline, "events")
+    _report("frame template + dumps (current)", _rate(current, len(tokens), repeat), baseline, "events")
+
+
+def bench_rows(rows: list[dict[str, Any]], repeat: int) -> None:
+    print(f"JSON responses, {len(rows)} rows")
+
+    def chat_model() -> None:
+        response = ChatResponse(answer="", data=rows)
+        JSONResponse(response.model_dump(mode="json"))
+
+    def fastapi_default() -> None:
+        JSONResponse(jsonable_encoder({"data": rows, "row_count": len(rows)}))
+
+    def json_module() -> None:
+        json.dumps({"data": rows, "row_count": len(rows)}, default=json_default)
+
+    def current() -> None:
+        FastJSONResponse({"data": rows, "row_count": len(rows)})
+
+    baseline = _rate(fastapi_default, len(rows), repeat)
+    _report("/sql: jsonable_encoder + JSONResponse (previous)", baseline, baseline, "rows")
+    _report("/chat: response model (previous)", _rate(chat_model, len(rows), repeat), baseline, "rows")
+    _report("json.dumps + json_default (previous streams)", _rate(json_module, len(rows), repeat), baseline, "rows")
+    _report("FastJSONResponse (current)", _rate(current, len(rows), repeat), baseline, "rows")
+
+
+def main(args: argparse.Namespace) -> None:
+    print(f"orjson: {'yes' if orjson_available() else 'no (json module fallback)'}")
+    bench_events(synthetic_tokens(args.tokens), args.repeat)
+    bench_rows(synthetic_rows(args.rows), args.repeat)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--tokens", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
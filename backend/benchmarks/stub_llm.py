@@ -0,0 +1,200 @@
+"""
+Stub LLM Server
+===============
+A tiny, dependency-free HTTP/1.1 server that speaks just enough of the
+Ollama (/api/chat) and OpenAI-style (/chat/completions) APIs for benchmarks.
+
+Responses are deterministic: every call returns the same SQL answer, with a
+configurable first-token latency and token rate. Setting a non-200 status
+makes every call fail (after the latency), e.g. to exercise router failover.
+
+Run standalone:
+    python benchmarks/stub_llm.py --port 11500 --latency-ms 5
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+
+DEFAULT_ANSWER = "```sql\nSELECT COUNT(*) AS customer_count FROM customers;\n```"
+
+
+@dataclass
+class StubConfig:
+    """How the stub LLM behaves."""
+    latency_ms: float = 0.0  # Delay before the first token
+    tokens_per_sec: float = 0.0  # 0 = send all tokens at once
+    answer: str = DEFAULT_ANSWER
+    status: int = 200  # Anything else is returned as an error response
+
+
+def _tokens(text: str) -> list[str]:
+    """Split the answer into word-ish tokens (whitespace kept on the left)."""
+    tokens, current = [], ""
+    for char in text:
+        if char.isspace() and current.strip():
+            tokens.append(current)
+            current = ""
+        current += char
+    if current:
+        tokens.append(current)
+    return tokens
+
+
+class StubLlmServer:
+    """
+    Usage:
+        server = StubLlmServer(StubConfig(latency_ms=5))
+        await server.start()
+        ...  # point OllamaProvider at server.url
+        await server.stop()
+    """
+
+    def __init__(self, config: StubConfig | None = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or StubConfig()
+        self.host = host
+        self.port = port
+        self.connections = 0  # TCP connections accepted (shows keep-alive reuse)
+        self.requests = 0
+        self._server: asyncio.base_events.Server | None = None
+        self._writers: set[asyncio.StreamWriter] = set()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            # Idle keep-alive connections would otherwise outlive the server
+            for writer in list(self._writers):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        self._writers.add(writer)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                _, path, _ = request_line.decode().split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode().partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                self.requests += 1
+                await self._respond(writer, path, json.loads(body or b"{}"))
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # Client went away, or the server is shutting down
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _respond(self, writer: asyncio.StreamWriter, path: str, payload: dict) -> None:
+        config = self.config
+        if config.latency_ms:
+            await asyncio.sleep(config.latency_ms / 1000)
+        if config.status != 200:
+            body = json.dumps({"error": "stub failure"}).encode()
+            writer.write(
+                f"HTTP/1.1 {config.status} Error\r\nContent-Type: application/json\r\n".encode()
+                + f"Content-Length: {len(body)}\r\n\r\n".encode()
+                + body
+            )
+            await writer.drain()
+            return
+        tokens = _tokens(config.answer)
+        openai = path.endswith("/chat/completions")
+
+        if not payload.get("stream"):
+            if config.tokens_per_sec:
+                await asyncio.sleep(len(tokens) / config.tokens_per_sec)
+            if openai:
+                data = {
+                    "choices": [{"message": {"role": "assistant", "content": config.answer}}],
+                    "usage": {"total_tokens": len(tokens)},
+                }
+            else:
+                data = {
+                    "message": {"role": "assistant", "content": config.answer},
+                    "eval_count": len(tokens),
+                    "done": True,
+                }
+            body = json.dumps(data).encode()
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                + f"Content-Length: {len(body)}\r\n\r\n".encode()
+                + body
+            )
+            await writer.drain()
+            return
+
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n"
+            + (b"Content-Type: text/event-stream\r\n\r\n" if openai
+               else b"Content-Type: application/x-ndjson\r\n\r\n")
+        )
+        delay = 1 / config.tokens_per_sec if config.tokens_per_sec else 0
+        for token in tokens:
+            if openai:
+                line = "data: " + json.dumps({"choices": [{"delta": {"content": token}}]}) + "\n\n"
+            else:
+                line = json.dumps({"message": {"role": "assistant", "content": token}, "done": False}) + "\n"
+            self._write_chunk(writer, line.encode())
+            await writer.drain()
+            if delay:
+                await asyncio.sleep(delay)
+        final = "data: [DONE]\n\n" if openai else json.dumps({"done": True, "eval_count": len(tokens)}) + "\n"
+        self._write_chunk(writer, final.encode())
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    @staticmethod
+    def _write_chunk(writer: asyncio.StreamWriter, data: bytes) -> None:
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    server = StubLlmServer(
+        StubConfig(
+            latency_ms=args.latency_ms,
+            tokens_per_sec=args.tokens_per_sec,
+            status=args.status,
+            answer=args.answer,
+        ),
+        port=args.port,
+    )
+    await server.start()
+    print(f"Stub LLM listening on {server.url}", flush=True)
+    started = time.monotonic()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        print(f"Served {server.requests} requests in {time.monotonic() - started:.0f}s")
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deterministic stub LLM server")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--tokens-per-sec", type=float, default=0.0)
+    parser.add_argument("--status", type=int, default=200)
+    parser.add_argument("--answer", default=DEFAULT_ANSWER)
+    asyncio.run(_serve(parser.parse_args()))
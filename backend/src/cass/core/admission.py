@@ -0,0 +1,216 @@
+"""
+LLM Admission Control for CASS
+==============================
+Bounds how many generations run against one provider/model at once.
+
+Requests beyond the concurrency limit wait in a bounded FIFO queue (first
+come, first served) with a deadline. When the queue is full they are
+rejected immediately instead of piling onto a model that is already
+saturated, so a burst degrades into fast 429/503 responses rather than
+every request timing out.
+
+Each provider/model gets its own controller. Behind an LlmRouter, wrap each
+backend rather than the router, so a hedged request holds a slot on every
+backend it runs on and a saturated backend fails over to the next one.
+
+Usage:
+    llm = AdmissionControlledProvider(
+        OllamaProvider(...),
+        AdmissionController(max_concurrent=2, max_queue=32, queue_timeout=30),
+    )
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+from typing import AsyncIterator
+
+from cass.core.llm import LlmMessage, LlmProvider, LlmResponse
+
+
+class AdmissionError(Exception):
+    """A request was not admitted; retry_after is a hint in seconds."""
+
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: int = 1) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueueFullError(AdmissionError):
+    """The wait queue is full (HTTP 429)."""
+
+    status_code = 429
+
+
+class QueueTimeoutError(AdmissionError):
+    """Waited longer than the queue deadline (HTTP 503)."""
+
+    status_code = 503
+
+
+@dataclass
+class AdmissionStats:
+    """Counters and gauges for one admission controller."""
+    admitted: int = 0
+    rejected: int = 0
+    timed_out: int = 0
+    active: int = 0
+    queued: int = 0
+    max_queued: int = 0
+    total_wait_ms: float = 0.0
+    max_wait_ms: float = 0.0
+    completed: int = 0
+    total_service_ms: float = 0.0
+
+    @property
+    def avg_wait_ms(self) -> float:
+        return self.total_wait_ms / self.admitted if self.admitted else 0.0
+
+    @property
+    def avg_service_ms(self) -> float:
+        return self.total_service_ms / self.completed if self.completed else 0.0
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            **asdict(self),
+            "avg_wait_ms": round(self.avg_wait_ms, 2),
+            "avg_service_ms": round(self.avg_service_ms, 2),
+        }
+
+
+class AdmissionController:
+    """Concurrency limit plus a bounded FIFO wait queue with deadlines."""
+
+    def __init__(
+        self,
+        max_concurrent: int = 2,
+        max_queue: int = 32,
+        queue_timeout: float = 30.0,
+    ) -> None:
+        """
+        Args:
+            max_concurrent: Requests allowed to run at once
+            max_queue: Requests allowed to wait; more are rejected at once
+            queue_timeout: Seconds a request may wait before it is rejected
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.stats = AdmissionStats()
+        self._waiters: deque[asyncio.Future[None]] = deque()
+
+    def _retry_after(self) -> int:
+        """Rough seconds until a queue slot frees up."""
+        service_s = self.stats.avg_service_ms / 1000 or 1.0
+        backlog = len(self._waiters) + 1
+        return max(1, math.ceil(service_s * backlog / self.max_concurrent))
+
+    @property
+    def has_capacity(self) -> bool:
+        """Whether a request arriving now would be admitted or queued."""
+        return self.stats.active < self.max_concurrent or len(self._waiters) < self.max_queue
+
+    def check_capacity(self) -> None:
+        """
+        Raise QueueFullError if a request arriving now would be rejected.
+
+        Lets streaming endpoints refuse before response headers are sent.
+        """
+        if not self.has_capacity:
+            self.stats.rejected += 1
+            raise QueueFullError("Too many requests waiting for the model", self._retry_after())
+
+    async def acquire(self, timeout: float | None = None) -> None:
+        """
+        Wait for a slot.
+
+        Raises:
+            QueueFullError: The wait queue is full
+            QueueTimeoutError: No slot freed up before the deadline
+        """
+        started = time.perf_counter()
+        if self.stats.active < self.max_concurrent and not self._waiters:
+            self.stats.active += 1
+            self._admitted(started)
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.stats.rejected += 1
+            raise QueueFullError("Too many requests waiting for the model", self._retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.stats.queued = len(self._waiters)
+        self.stats.max_queued = max(self.stats.max_queued, self.stats.queued)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout if timeout is None else timeout)
+        except asyncio.TimeoutError:
+            self.stats.timed_out += 1
+            raise QueueTimeoutError("Timed out waiting for the model", self._retry_after()) from None
+        except asyncio.CancelledError:
+            # The slot may have been handed over just as we were cancelled
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            self.stats.queued = len(self._waiters)
+        self._admitted(started)
+
+    def release(self, service_ms: float | None = None) -> None:
+        """Free a slot, handing it straight to the longest waiter if any."""
+        if service_ms is not None:
+            self.stats.completed += 1
+            self.stats.total_service_ms += service_ms
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            self.stats.queued = len(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)  # active count carries over
+                return
+        self.stats.active -= 1
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block."""
+        await self.acquire()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release((time.perf_counter() - started) * 1000)
+
+    def _admitted(self, started: float) -> None:
+        wait_ms = (time.perf_counter() - started) * 1000
+        self.stats.admitted += 1
+        self.stats.total_wait_ms += wait_ms
+        self.stats.max_wait_ms = max(self.stats.max_wait_ms, wait_ms)
+
+
+class AdmissionControlledProvider(LlmProvider):
+    """LlmProvider wrapper that runs every call through an AdmissionController."""
+
+    def __init__(self, provider: LlmProvider, controller: AdmissionController) -> None:
+        self.provider = provider
+        self.controller = controller
+
+    async def chat(
+        self, messages: list[LlmMessage], temperature: float | None = None
+    ) -> LlmResponse:
+        async with self.controller.slot():
+            return await self.provider.chat(messages, temperature=temperature)
+
+    async def chat_stream(self, messages: list[LlmMessage]) -> AsyncIterator[str]:
+        # The slot is held until the stream is exhausted or closed
+        async with self.controller.slot():
+            async for token in self.provider.chat_stream(messages):
+                yield token
+
+    async def aclose(self) -> None:
+        await self.provider.aclose()
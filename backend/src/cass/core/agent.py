@@ -1,10 +1,22 @@
-import re
+import asyncio
 from dataclasses import dataclass
 from typing import Any
 
-from cass.core.llm import LlmProvider, LlmMessage, Role
+from cass.core.admission import AdmissionError
+from cass.core.answer_cache import AnswerCache, normalize_question
+from cass.core.llm import LlmProvider, LlmMessage, LlmResponse, Role
+from cass.core.singleflight import SingleFlight
+from cass.core.sql_extract import extract_sql
+from cass.core.sql_validator import SqlValidator, format_issues
+from cass.core.telemetry import telemetry
 from cass.core.tool import Tool, ToolResult
 
+# Stop sequences for model servers that support them: generation ends once
+# the ```sql block is closed instead of running on into an explanation.
+# The stop text itself is not returned, so the block may come back
+# unterminated (see _extract_sql).
+SQL_STOP_SEQUENCES = ["\n```\n", ";\n```"]
+
 
 @dataclass
 class AgentResponse:
@@ -13,6 +25,7 @@ class AgentResponse:
     sql: str | None = None
     data: Any = None
     error: str | None = None  # Added for error handling
+    cached: bool = False  # True when the SQL came from the answer cache
 
 
 class Agent:
@@ -22,11 +35,33 @@ class Agent:
         self,
         llm: LlmProvider,
         tools: list[Tool],
-        system_prompt: str | None = None
+        system_prompt: str | None = None,
+        answer_cache: AnswerCache | None = None,
+        sql_candidates: int = 1,
+        candidate_max_temperature: float = 0.8,
+        coalesce: bool = True,
     ) -> None:
+        """
+        Args:
+            llm: Provider used to generate SQL
+            tools: Tools available to the agent (run_sql executes the SQL)
+            system_prompt: Overrides the default SQL prompt
+            answer_cache: Reuse SQL for repeated questions
+            sql_candidates: With more than 1, chat() asks the LLM for this many
+                candidates concurrently (temperatures spread from 0 up to
+                candidate_max_temperature), validates them with EXPLAIN and
+                runs the first valid one
+            candidate_max_temperature: Temperature of the last candidate
+            coalesce: Let identical questions asked while one is in flight
+                share its answer instead of each calling the LLM
+        """
         self.llm = llm
         self.tools = {tool.name: tool for tool in tools}
         self.system_prompt = system_prompt or self._default_system_prompt()
+        self.answer_cache = answer_cache
+        self.sql_candidates = sql_candidates
+        self.candidate_max_temperature = candidate_max_temperature
+        self.inflight: SingleFlight[AgentResponse] | None = SingleFlight() if coalesce else None
 
     def _default_system_prompt(self) -> str:
         """Generate improved system prompt for accurate SQL generation."""
@@ -66,17 +101,74 @@ FROM customers
 WHERE city ILIKE '%new york%';
 ```"""
 
-    async def chat(self, user_message: str, schema: str) -> AgentResponse:
-        """Process a user message and return a response."""
-        messages = [
-            LlmMessage(role=Role.SYSTEM, content=self.system_prompt),
-            LlmMessage(role=Role.SYSTEM, content=f"DATABASE SCHEMA:\n{schema}"),
-            LlmMessage(role=Role.USER, content=user_message)
-        ]
+    async def chat(
+        self,
+        user_message: str,
+        schema: str,
+        schema_version: str | None = None,
+        columnar: bool = False,
+        validator: SqlValidator | None = None,
+        history: list[LlmMessage] | None = None,
+    ) -> AgentResponse:
+        """
+        Process a user message and return a response.
+
+        When an answer cache is configured and schema_version is given,
+        repeated questions skip the LLM and run the cached SQL directly.
+        With columnar=True, data is a ColumnarResult instead of a list of rows.
+        With a validator, generated SQL is checked in-process first; invalid
+        SQL goes straight to the retry without a database round trip.
+        Identical questions (same normalized text and schema version) that
+        arrive while one is in flight wait for it and share its response.
+        history holds earlier turns of the conversation (see cass.core.session);
+        they go between the schema and the question, and such follow-ups skip
+        the answer cache and coalescing since their meaning depends on it.
+        """
+        if history:
+            return await self._chat(user_message, schema, None, columnar, validator, history)
+        if self.inflight is not None and schema_version is not None:
+            key = (normalize_question(user_message), schema_version, columnar)
+            return await self.inflight.do(
+                key,
+                lambda: self._chat(user_message, schema, schema_version, columnar, validator),
+            )
+        return await self._chat(user_message, schema, schema_version, columnar, validator)
+
+    async def _chat(
+        self,
+        user_message: str,
+        schema: str,
+        schema_version: str | None,
+        columnar: bool,
+        validator: SqlValidator | None,
+        history: list[LlmMessage] | None = None,
+    ) -> AgentResponse:
+        """chat() without coalescing."""
+        if self.answer_cache is not None and schema_version is not None:
+            with telemetry.span("answer_cache"):
+                cached = await self._answer_from_cache(user_message, schema_version, columnar)
+            if cached is not None:
+                return cached
+
+        with telemetry.span("prompt"):
+            # Stable prefix first (system prompt, schema, earlier turns) so
+            # the model server can reuse its cache for it
+            messages = [
+                *self.prompt_prefix(schema),
+                *(history or []),
+                LlmMessage(role=Role.USER, content=user_message)
+            ]
 
         try:
             # Get LLM response
-            response = await self.llm.chat(messages)
+            with telemetry.span("llm") as span:
+                if self.sql_candidates > 1 and "run_sql" in self.tools:
+                    response = await self._first_valid_candidate(messages, validator)
+                else:
+                    response = await self.llm.chat(messages)
+                span.set("tokens", response.tokens_used)
+        except AdmissionError:
+            raise  # overloaded: let the server answer 429/503
         except Exception as e:
             return AgentResponse(
                 answer="Failed to get response from AI",
@@ -86,25 +178,39 @@ WHERE city ILIKE '%new york%';
             )
 
         # Extract SQL if present
-        sql = self._extract_sql(response.content)
+        with telemetry.span("extract"):
+            sql = self._extract_sql(response.content)
 
         # Execute SQL if found
         data = None
         error = None
 
         if sql and "run_sql" in self.tools:
-            result = await self.tools["run_sql"].execute(sql=sql)
-            if result.success:
-                data = result.data
-            else:
-                error = result.error
+            with telemetry.span("validate"):
+                error = self._check_sql(sql, validator)
+            if error is None:
+                with telemetry.span("execute"):
+                    result = await self.tools["run_sql"].execute(sql=sql, columnar=columnar)
+                if result.success:
+                    data = result.data
+                else:
+                    error = result.error
+            if error is not None:
                 # Try to fix the SQL with a retry
-                fixed_response = await self._retry_with_error(
-                    user_message, schema, sql, result.error
-                )
+                with telemetry.span("retry"):
+                    fixed_response = await self._retry_with_error(
+                        user_message, schema, sql, error, columnar, validator, history
+                    )
                 if fixed_response:
+                    self._remember(user_message, schema_version, fixed_response)
                     return fixed_response
 
+        if sql and error is None:
+            self._remember(
+                user_message, schema_version,
+                AgentResponse(answer=response.content, sql=sql),
+            )
+
         return AgentResponse(
             answer=response.content,
             sql=sql,
@@ -112,36 +218,196 @@ WHERE city ILIKE '%new york%';
             error=error
         )
 
+    async def generate_sql(
+        self,
+        user_message: str,
+        schema: str,
+        schema_version: str | None = None,
+        validator: SqlValidator | None = None,
+        history: list[LlmMessage] | None = None,
+    ) -> AgentResponse:
+        """
+        Produce SQL for a question without running it (data is always None).
+
+        For callers that run the query themselves, e.g. background jobs with
+        their own timeout and result storage; they should store working SQL
+        in the answer cache. Repeated questions take the SQL from the cache.
+        Generated SQL is checked with the validator and EXPLAIN, and if that
+        fails the LLM gets one retry with the error.
+        """
+        if self.answer_cache is not None and schema_version is not None and not history:
+            entry = self.answer_cache.lookup(user_message, schema_version)
+            if entry is not None:
+                return AgentResponse(answer=entry.answer, sql=entry.sql, cached=True)
+
+        messages = [
+            *self.prompt_prefix(schema),
+            *(history or []),
+            LlmMessage(role=Role.USER, content=user_message)
+        ]
+        try:
+            with telemetry.span("llm") as span:
+                response = await self.llm.chat(messages)
+                span.set("tokens", response.tokens_used)
+        except AdmissionError:
+            raise
+        except Exception as e:
+            return AgentResponse(answer="Failed to get response from AI", error=f"LLM Error: {str(e)}")
+
+        sql = self._extract_sql(response.content)
+        if not sql:
+            return AgentResponse(answer=response.content)
+        with telemetry.span("validate"):
+            error = await self._plan_error(sql, validator)
+        if error is None:
+            return AgentResponse(answer=response.content, sql=sql)
+
+        with telemetry.span("retry"):
+            try:
+                fixed = await self.llm.chat(
+                    self._retry_messages(user_message, schema, sql, error, history)
+                )
+            except AdmissionError:
+                raise
+            except Exception:
+                fixed = None
+            fixed_sql = self._extract_sql(fixed.content) if fixed is not None else None
+            if fixed_sql and await self._plan_error(fixed_sql, validator) is None:
+                return AgentResponse(answer=fixed.content, sql=fixed_sql)
+        return AgentResponse(answer=response.content, sql=sql, error=error)
+
+    async def _plan_error(self, sql: str, validator: SqlValidator | None) -> str | None:
+        """
+        Check SQL in-process, then with EXPLAIN; returns the error, if any.
+
+        The cost guard is skipped: the caller runs the query with its own
+        timeout and row limit.
+        """
+        error = self._check_sql(sql, validator)
+        if error is None and "run_sql" in self.tools:
+            result = await self.tools["run_sql"].validate(sql, guard=False)
+            if not result.success:
+                error = result.error
+        return error
+
+    def _check_sql(self, sql: str, validator: SqlValidator | None) -> str | None:
+        """Validate SQL in-process; returns an error message if it is invalid."""
+        if validator is None:
+            return None
+        issues = validator.validate(sql)
+        if not issues:
+            return None
+        return f"Invalid SQL:\n{format_issues(issues)}"
+
+    def _candidate_temperatures(self) -> list[float]:
+        """Spread temperatures so concurrent candidates actually differ."""
+        n = self.sql_candidates
+        return [round(self.candidate_max_temperature * i / (n - 1), 2) for i in range(n)]
+
+    async def _candidate(
+        self,
+        messages: list[LlmMessage],
+        temperature: float,
+        validator: SqlValidator | None = None,
+    ) -> tuple[LlmResponse, bool]:
+        """Generate one SQL candidate and check it (locally, then with EXPLAIN)."""
+        response = await self.llm.chat(messages, temperature=temperature)
+        sql = self._extract_sql(response.content)
+        if not sql or self._check_sql(sql, validator) is not None:
+            return response, False
+        check = await self.tools["run_sql"].validate(sql)
+        return response, check.success
+
+    async def _first_valid_candidate(
+        self, messages: list[LlmMessage], validator: SqlValidator | None = None
+    ) -> LlmResponse:
+        """
+        Generate SQL candidates concurrently and return the first whose SQL
+        passes EXPLAIN, cancelling the rest.
+
+        If none is valid, the first response containing SQL is returned so
+        the caller's run/retry path reports (and tries to fix) its error.
+        Raises the first LLM error if every call failed.
+        """
+        tasks = [
+            asyncio.create_task(self._candidate(messages, temperature, validator))
+            for temperature in self._candidate_temperatures()
+        ]
+        fallback: LlmResponse | None = None
+        errors: list[Exception] = []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    response, valid = await next_done
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                if valid:
+                    return response
+                if fallback is None or (
+                    self._extract_sql(fallback.content) is None
+                    and self._extract_sql(response.content) is not None
+                ):
+                    fallback = response
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        if fallback is None:
+            raise errors[0]
+        return fallback
+
+    async def _answer_from_cache(
+        self, user_message: str, schema_version: str, columnar: bool = False
+    ) -> AgentResponse | None:
+        """Run the cached SQL for a repeated question, if there is one."""
+        assert self.answer_cache is not None
+        entry = self.answer_cache.lookup(user_message, schema_version)
+        if entry is None or "run_sql" not in self.tools:
+            return None
+
+        result = await self.tools["run_sql"].execute(sql=entry.sql, columnar=columnar)
+        if not result.success:
+            # The cached SQL no longer works; fall back to the LLM
+            self.answer_cache.discard(entry)
+            return None
+
+        return AgentResponse(
+            answer=entry.answer,
+            sql=entry.sql,
+            data=result.data,
+            error=None,
+            cached=True,
+        )
+
+    def _remember(
+        self, user_message: str, schema_version: str | None, response: AgentResponse
+    ) -> None:
+        """Store a working answer in the answer cache."""
+        if self.answer_cache is None or schema_version is None or not response.sql:
+            return
+        self.answer_cache.store(user_message, schema_version, response.sql, response.answer)
+
     async def _retry_with_error(
         self,
         user_message: str,
         schema: str,
         failed_sql: str,
-        error: str
+        error: str,
+        columnar: bool = False,
+        validator: SqlValidator | None = None,
+        history: list[LlmMessage] | None = None,
     ) -> AgentResponse | None:
         """Retry SQL generation with error feedback."""
-        retry_messages = [
-            LlmMessage(role=Role.SYSTEM, content=self.system_prompt),
-            LlmMessage(role=Role.SYSTEM, content=f"DATABASE SCHEMA:\n{schema}"),
-            LlmMessage(role=Role.USER, content=user_message),
-            LlmMessage(role=Role.ASSISTANT, content=f"```sql\n{failed_sql}\n```"),
-            LlmMessage(role=Role.USER, content=f"""That SQL query failed with error:
-{error}
-
-Please fix the SQL query. Remember to:
-- Use ONLY columns that exist in the schema
-- Check spelling and case of column names
-- Ensure proper JOIN conditions
-
-Provide the corrected SQL:""")
-        ]
+        retry_messages = self._retry_messages(user_message, schema, failed_sql, error, history)
 
         try:
             response = await self.llm.chat(retry_messages)
             sql = self._extract_sql(response.content)
 
-            if sql and "run_sql" in self.tools:
-                result = await self.tools["run_sql"].execute(sql=sql)
+            if sql and "run_sql" in self.tools and self._check_sql(sql, validator) is None:
+                result = await self.tools["run_sql"].execute(sql=sql, columnar=columnar)
                 if result.success:
                     return AgentResponse(
                         answer=response.content,
@@ -154,12 +420,39 @@ Provide the corrected SQL:""")
 
         return None
 
-    def _extract_sql(self, content: str) -> str | None:
-        """Extract SQL from markdown code blocks."""
-        pattern = r"```sql\s*(.*?)\s*```"
-        match = re.search(pattern, content, re.DOTALL | re.IGNORECASE)
+    def _retry_messages(
+        self,
+        user_message: str,
+        schema: str,
+        failed_sql: str,
+        error: str,
+        history: list[LlmMessage] | None = None,
+    ) -> list[LlmMessage]:
+        """The original prompt, the failed answer, and a request to fix it."""
+        return [
+            *self.prompt_prefix(schema),
+            *(history or []),
+            LlmMessage(role=Role.USER, content=user_message),
+            LlmMessage(role=Role.ASSISTANT, content=f"```sql\n{failed_sql}\n```"),
+            LlmMessage(role=Role.USER, content=f"""That SQL query failed with error:
+{error}
 
-        if match:
-            return match.group(1).strip()
-        return None
+Please fix the SQL query. Remember to:
+- Use ONLY columns that exist in the schema
+- Check spelling and case of column names
+- Ensure proper JOIN conditions
+
+Provide the corrected SQL:""")
+        ]
+
+    def prompt_prefix(self, schema: str) -> list[LlmMessage]:
+        """The messages every prompt for this schema starts with."""
+        return [
+            LlmMessage(role=Role.SYSTEM, content=self.system_prompt),
+            LlmMessage(role=Role.SYSTEM, content=f"DATABASE SCHEMA:\n{schema}"),
+        ]
+
+    def _extract_sql(self, content: str) -> str | None:
+        """Extract SQL from markdown code blocks (the closing fence may be cut off by a stop sequence)."""
+        return extract_sql(content)
 
@@ -0,0 +1,287 @@
+"""
+Answer Cache for CASS
+=====================
+Caches question -> SQL answers so repeated questions skip the LLM call.
+
+Entries are keyed on the normalized question text plus the schema version,
+so a schema change never serves SQL written for an older schema. An
+optional similarity tier uses MinHash signatures with LSH banding to match
+near-duplicate wordings ("top 10 products by revenue" vs "top 10 products
+by their revenue"). Eviction is LRU, bounded by entry count and an
+approximate memory cap, with a per-entry TTL.
+"""
+
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+
+_WORD_RE = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+_NUMBER_RE = re.compile(r"^[0-9]+(?:\.[0-9]+)?$")
+
+# Mersenne prime used for the MinHash permutations
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 64) - 1
+
+# Fixed bookkeeping cost per entry, on top of the stored strings
+_ENTRY_OVERHEAD = 256
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return " ".join(_WORD_RE.findall(question.lower()))
+
+
+def _shingles(normalized: str) -> set[str]:
+    """Word unigrams and bigrams of a normalized question."""
+    words = normalized.split()
+    shingles = set(words)
+    shingles.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return shingles
+
+
+def _numbers(normalized: str) -> frozenset[str]:
+    """Numeric tokens; near-duplicates must agree on these exactly."""
+    return frozenset(word for word in normalized.split() if _NUMBER_RE.match(word))
+
+
+def _hash64(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class MinHasher:
+    """MinHash signatures over word shingles, for Jaccard similarity estimates."""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1) -> None:
+        self.num_perm = num_perm
+        # Deterministic (a, b) pairs for the universal hash family
+        self._perms = [
+            (_hash64(f"a{seed}:{i}") % (_PRIME - 1) + 1, _hash64(f"b{seed}:{i}") % _PRIME)
+            for i in range(num_perm)
+        ]
+
+    def signature(self, shingles: set[str]) -> tuple[int, ...]:
+        hashes = [_hash64(shingle) for shingle in shingles] or [0]
+        return tuple(
+            min((a * h + b) % _PRIME for h in hashes)
+            for a, b in self._perms
+        )
+
+    @staticmethod
+    def similarity(a: tuple[int, ...], b: tuple[int, ...]) -> float:
+        """Estimated Jaccard similarity of two signatures."""
+        return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+@dataclass
+class CachedAnswer:
+    """A cached LLM answer for one question under one schema version."""
+    question: str
+    sql: str
+    answer: str
+    schema_version: str
+    created_at: float = field(default_factory=time.monotonic)
+    size: int = 0
+    signature: tuple[int, ...] = ()
+    numbers: frozenset[str] = frozenset()
+
+
+@dataclass
+class AnswerCacheStats:
+    """Counters describing how the answer cache is being used."""
+    hits: int = 0
+    similar_hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.similar_hits + self.misses
+        return (self.hits + self.similar_hits) / lookups if lookups else 0.0
+
+    def as_dict(self) -> dict[str, float]:
+        return {**asdict(self), "hit_rate": self.hit_rate}
+
+
+class AnswerCache:
+    """
+    LRU/TTL cache from (normalized question, schema version) to SQL.
+
+    Usage:
+        cache = AnswerCache(max_entries=1000, ttl=3600, similarity_threshold=0.9)
+        hit = cache.lookup("How many orders today?", schema_version)
+        if hit is None:
+            ...  # ask the LLM, then:
+            cache.store("How many orders today?", schema_version, sql, answer)
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        max_bytes: int = 8 * 1024 * 1024,
+        ttl: float = 3600.0,
+        similarity_threshold: float | None = 0.9,
+        num_perm: int = 64,
+        bands: int = 16,
+    ) -> None:
+        """
+        Args:
+            max_entries: Maximum number of cached answers
+            max_bytes: Approximate memory cap for cached answers
+            ttl: Seconds an answer stays valid
+            similarity_threshold: Minimum estimated Jaccard similarity for a
+                near-duplicate hit; None disables the similarity tier
+            num_perm: MinHash signature length
+            bands: LSH bands (num_perm must be divisible by bands)
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.stats = AnswerCacheStats()
+        self._entries: OrderedDict[tuple[str, str], CachedAnswer] = OrderedDict()
+        self._bytes = 0
+        self._hasher = MinHasher(num_perm) if similarity_threshold else None
+        self._bands = bands
+        self._rows = num_perm // bands
+        self._buckets: dict[tuple, set[tuple[str, str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def lookup(self, question: str, schema_version: str) -> CachedAnswer | None:
+        """Find a cached answer for the question (exact, then near-duplicate)."""
+        normalized = normalize_question(question)
+        key = (schema_version, normalized)
+
+        entry = self._get_live(key)
+        if entry is not None:
+            self.stats.hits += 1
+            return entry
+
+        if self._hasher is not None:
+            entry = self._lookup_similar(normalized, schema_version)
+            if entry is not None:
+                self.stats.similar_hits += 1
+                return entry
+
+        self.stats.misses += 1
+        return None
+
+    def store(self, question: str, schema_version: str, sql: str, answer: str) -> None:
+        """Cache the SQL answer for a question."""
+        normalized = normalize_question(question)
+        if not normalized:
+            return
+        key = (schema_version, normalized)
+        if key in self._entries:
+            self._remove(key)
+
+        entry = CachedAnswer(
+            question=normalized,
+            sql=sql,
+            answer=answer,
+            schema_version=schema_version,
+            size=_ENTRY_OVERHEAD + len(normalized) + len(sql) + len(answer),
+            numbers=_numbers(normalized),
+        )
+        if entry.size > self.max_bytes:
+            return
+        if self._hasher is not None:
+            entry.signature = self._hasher.signature(_shingles(normalized))
+            entry.size += 8 * len(entry.signature)
+            for bucket in self._band_keys(schema_version, entry.signature):
+                self._buckets.setdefault(bucket, set()).add(key)
+
+        self._entries[key] = entry
+        self._bytes += entry.size
+        self.stats.stores += 1
+
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.stats.evictions += 1
+
+    def invalidate(self, question: str, schema_version: str) -> None:
+        """Drop the exact entry for a question (e.g. its SQL stopped working)."""
+        key = (schema_version, normalize_question(question))
+        if key in self._entries:
+            self._remove(key)
+            self.stats.invalidations += 1
+
+    def discard(self, entry: CachedAnswer) -> None:
+        """Drop a specific entry returned by lookup()."""
+        key = (entry.schema_version, entry.question)
+        if self._entries.get(key) is entry:
+            self._remove(key)
+            self.stats.invalidations += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._buckets.clear()
+        self._bytes = 0
+
+    def _get_live(self, key: tuple[str, str]) -> CachedAnswer | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.created_at >= self.ttl:
+            self._remove(key)
+            self.stats.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _lookup_similar(self, normalized: str, schema_version: str) -> CachedAnswer | None:
+        assert self._hasher is not None and self.similarity_threshold is not None
+        signature = self._hasher.signature(_shingles(normalized))
+        numbers = _numbers(normalized)
+
+        candidates: set[tuple[str, str]] = set()
+        for bucket in self._band_keys(schema_version, signature):
+            candidates.update(self._buckets.get(bucket, ()))
+
+        best: CachedAnswer | None = None
+        best_score = self.similarity_threshold
+        for key in candidates:
+            entry = self._entries.get(key)
+            # "top 5" and "top 10" must never share an answer
+            if entry is None or entry.numbers != numbers:
+                continue
+            score = MinHasher.similarity(signature, entry.signature)
+            if score >= best_score:
+                best, best_score = entry, score
+
+        if best is None:
+            return None
+        return self._get_live((best.schema_version, best.question))
+
+    def _band_keys(self, schema_version: str, signature: tuple[int, ...]) -> list[tuple]:
+        rows = self._rows
+        return [
+            (schema_version, band, signature[band * rows:(band + 1) * rows])
+            for band in range(self._bands)
+        ]
+
+    def _remove(self, key: tuple[str, str]) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        if entry.signature:
+            for bucket in self._band_keys(entry.schema_version, entry.signature):
+                keys = self._buckets.get(bucket)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._buckets[bucket]
@@ -0,0 +1,203 @@
+"""
+Query Cost Guard for CASS
+=========================
+Keeps generated SQL from taking over the database: the planner gets to
+look at each query before it runs.
+
+- LIMIT: a query without a top-level LIMIT gets one (default_limit), and a
+  larger LIMIT or FETCH FIRST n is lowered to max_limit
+- Plan: the limited query is planned with EXPLAIN (FORMAT JSON) and
+  rejected when its estimated total cost is over max_cost, or when any plan
+  node expects more than max_plan_rows rows (a missing join condition shows
+  up here even under an aggregate or a LIMIT)
+- Timeout: the query then runs in a read-only transaction with
+  statement_timeout set for it (see RunSQLTool)
+
+Cost is in the planner's units (seq_page_cost = 1), so max_cost depends on
+the data size and the cost settings of the server; raise it when sensible
+queries are rejected. Rejection messages are written to be fed back to the
+LLM, like SqlIssue messages.
+
+Usage:
+    guard = CostGuard(QueryLimits(max_cost=1e6))
+    sql = guard.limit(sql)
+    estimate = guard.check(await db.explain_plan(sql))  # raises QueryRejected
+"""
+
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from cass.core.sql_validator import Token, tokenize
+
+
+@dataclass
+class QueryLimits:
+    """What a generated query may cost (0 or None = no limit)."""
+    default_limit: int = 1000  # LIMIT added to queries without one
+    max_limit: int = 10_000  # larger LIMITs are lowered to this
+    max_cost: float = 1_000_000.0  # planner cost units
+    max_plan_rows: float = 100_000_000.0  # rows expected by any plan node
+    statement_timeout: float | None = 30.0  # seconds
+
+
+@dataclass
+class PlanEstimate:
+    """What the planner expects of a query."""
+    total_cost: float
+    rows: float  # rows returned
+    max_node_rows: float  # rows of the plan node expecting the most
+    max_node: str  # that node's type, e.g. "Nested Loop"
+
+    @classmethod
+    def from_explain(cls, plan: list[dict[str, Any]]) -> "PlanEstimate":
+        """Read the output of EXPLAIN (FORMAT JSON)."""
+        root = plan[0]["Plan"]
+        max_node, max_rows = root, root["Plan Rows"]
+        stack = list(root.get("Plans", ()))
+        while stack:
+            node = stack.pop()
+            if node["Plan Rows"] > max_rows:
+                max_node, max_rows = node, node["Plan Rows"]
+            stack.extend(node.get("Plans", ()))
+        return cls(
+            total_cost=root["Total Cost"],
+            rows=root["Plan Rows"],
+            max_node_rows=max_rows,
+            max_node=max_node["Node Type"],
+        )
+
+
+class QueryRejected(Exception):
+    """The planner expects the query to be too expensive to run."""
+
+    def __init__(self, message: str, estimate: PlanEstimate) -> None:
+        super().__init__(message)
+        self.estimate = estimate
+
+
+@dataclass
+class CostGuardStats:
+    """Counters for the cost guard."""
+    checked: int = 0
+    limit_added: int = 0
+    limit_capped: int = 0
+    rejected_cost: int = 0
+    rejected_rows: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+def _number(token: Token | None) -> int | None:
+    if token is None or token.kind != "number":
+        return None
+    return int(float(token.value))
+
+
+def limit_rows(sql: str, default_limit: int, max_limit: int) -> tuple[str, str | None]:
+    """
+    Make sure a single SELECT returns a bounded number of rows.
+
+    Only the top level counts: a LIMIT inside a subquery or CTE bounds
+    that part, not the result. A LIMIT given as a parameter is left alone.
+
+    Args:
+        sql: The query
+        default_limit: LIMIT to add when there is none (0 = don't add)
+        max_limit: Lower a LIMIT or FETCH FIRST count above this (0 = don't)
+
+    Returns:
+        (sql, what was done: None, "added" or "capped")
+    """
+    tokens = tokenize(sql)
+    depth = 0
+    for i, token in enumerate(tokens):
+        if token.kind == "op" and token.value in "()":
+            depth += 1 if token.value == "(" else -1
+            continue
+        if depth or token.kind != "word" or token.value not in ("limit", "fetch"):
+            continue
+
+        following = tokens[i + 1] if i + 1 < len(tokens) else None
+        if token.value == "fetch":
+            # FETCH FIRST|NEXT [n] ROW|ROWS ONLY; without n it is one row
+            following = tokens[i + 2] if i + 2 < len(tokens) else None
+            count = _number(following)
+            if count is None or not max_limit or count <= max_limit:
+                return sql, None
+        elif following is not None and following.kind == "word" and following.value == "all":
+            if not max_limit:
+                return sql, None  # LIMIT ALL, and nothing to lower it to
+        else:
+            count = _number(following)
+            if count is None or not max_limit or count <= max_limit:
+                return sql, None
+        end = following.start + len(following.value)
+        return f"{sql[:following.start]}{max_limit}{sql[end:]}", "capped"
+
+    if not default_limit:
+        return sql, None
+    if tokens and tokens[-1].kind == "op" and tokens[-1].value == ";":
+        sql = sql[:tokens[-1].start]
+    # On its own line, in case the query ends with a -- comment
+    return f"{sql.rstrip()}\nLIMIT {default_limit}", "added"
+
+
+class CostGuard:
+    """
+    Bounds generated queries by their LIMIT and their planner estimates.
+
+    Stateless apart from its counters; the caller runs EXPLAIN.
+    """
+
+    def __init__(self, limits: QueryLimits | None = None) -> None:
+        self.limits = limits or QueryLimits()
+        self.stats = CostGuardStats()
+
+    def limit(self, sql: str, max_rows: int | None = None) -> str:
+        """
+        Add or lower the query's LIMIT.
+
+        Args:
+            sql: The query
+            max_rows: Use this as both the LIMIT to add and the most
+                allowed, e.g. when the caller reads at most this many rows
+                anyway (None = the configured limits)
+        """
+        if max_rows is not None:
+            sql, action = limit_rows(sql, max_rows, max_rows)
+        else:
+            sql, action = limit_rows(sql, self.limits.default_limit, self.limits.max_limit)
+        if action == "added":
+            self.stats.limit_added += 1
+        elif action == "capped":
+            self.stats.limit_capped += 1
+        return sql
+
+    def check(self, plan: list[dict[str, Any]]) -> PlanEstimate:
+        """
+        Judge a plan from EXPLAIN (FORMAT JSON).
+
+        Raises:
+            QueryRejected: The plan is over the cost or row limit
+        """
+        self.stats.checked += 1
+        estimate = PlanEstimate.from_explain(plan)
+        limits = self.limits
+        if limits.max_cost and estimate.total_cost > limits.max_cost:
+            self.stats.rejected_cost += 1
+            raise QueryRejected(
+                f"Query rejected: the estimated cost ({estimate.total_cost:,.0f}) is over the "
+                f"limit ({limits.max_cost:,.0f}). Filter on indexed columns, aggregate, or "
+                "check that every join has a join condition.",
+                estimate,
+            )
+        if limits.max_plan_rows and estimate.max_node_rows > limits.max_plan_rows:
+            self.stats.rejected_rows += 1
+            raise QueryRejected(
+                f"Query rejected: a {estimate.max_node} step is expected to produce "
+                f"{estimate.max_node_rows:,.0f} rows (limit {limits.max_plan_rows:,.0f}). "
+                "Check that every join has a join condition.",
+                estimate,
+            )
+        return estimate
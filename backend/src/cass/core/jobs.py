@@ -0,0 +1,348 @@
+"""
+Background Jobs for CASS
+========================
+Runs long questions and queries outside the HTTP request: the client
+submits a job, gets its ID straight away, and polls it (or follows its
+progress over SSE) until the result is ready to page through.
+
+- JobScheduler runs at most `max_concurrent` jobs at once; up to
+  `max_queued` more wait for a slot, beyond that submit() raises
+  QueueFullError (429)
+- A job's rows are kept as encoded JSON, in memory while small and in a
+  file once they outgrow `spill_bytes`; pages are read back by row offset
+- Finished jobs (and their files) are dropped `ttl` seconds after they end
+- Cancelling a job cancels its task; a query in flight is cancelled on the
+  server too (asyncpg sends a cancel request when the awaiting task is
+  cancelled), and an LLM call gives back its admission slot
+
+Jobs live in the process that accepted them.
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from enum import Enum
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+from cass.core.admission import QueueFullError
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+FINISHED = frozenset({JobStatus.SUCCEEDED, JobStatus.FAILED, JobStatus.CANCELLED})
+
+
+class JobResult:
+    """
+    A job's rows as JSON strings, in memory until they outgrow spill_bytes
+    and in a file (one row per line) after that.
+    """
+
+    def __init__(self, path: str, spill_bytes: int) -> None:
+        """
+        Args:
+            path: File to spill to (created on first spill)
+            spill_bytes: Encoded size kept in memory before spilling
+        """
+        self.path = path
+        self.spill_bytes = spill_bytes
+        self.columns: list[str] = []
+        self.row_count = 0
+        self.byte_count = 0
+        self.truncated = False
+        self._rows: list[str] = []
+        # Once spilled: byte offset of each row in the file, plus the end
+        self._offsets: list[int] | None = None
+
+    @property
+    def spilled(self) -> bool:
+        return self._offsets is not None
+
+    async def append(self, rows: list[str]) -> None:
+        """Add encoded rows."""
+        self.row_count += len(rows)
+        if self._offsets is None:
+            self._rows.extend(rows)
+            self.byte_count += sum(len(row) for row in rows)
+            if self.byte_count <= self.spill_bytes:
+                return
+            # Too big for memory: move everything so far to the file
+            rows, self._rows = self._rows, []
+            self._offsets = [0]
+            self.byte_count = 0
+        data = [row.encode() + b"\n" for row in rows]
+        for line in data:
+            self._offsets.append(self._offsets[-1] + len(line))
+            self.byte_count += len(line)
+        await asyncio.to_thread(self._write, b"".join(data))
+
+    def _write(self, data: bytes) -> None:
+        with open(self.path, "ab") as file:
+            file.write(data)
+
+    async def page(self, offset: int, limit: int) -> list[str]:
+        """Encoded rows offset..offset+limit."""
+        if self._offsets is None:
+            return self._rows[offset:offset + limit]
+        end = min(offset + limit, self.row_count)
+        if offset >= end:
+            return []
+        start_byte, end_byte = self._offsets[offset], self._offsets[end]
+        data = await asyncio.to_thread(self._read, start_byte, end_byte - start_byte)
+        return data.decode().split("\n")[:-1]
+
+    def _read(self, start: int, size: int) -> bytes:
+        with open(self.path, "rb") as file:
+            file.seek(start)
+            return file.read(size)
+
+    def delete(self) -> None:
+        """Free the rows and remove the spill file."""
+        self._rows = []
+        if self._offsets is not None:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+
+@dataclass
+class Job:
+    """One submitted question or query and what has come of it so far."""
+    id: str
+    kind: str  # "chat" or "sql"
+    request: str  # The question or the SQL
+    status: JobStatus = JobStatus.QUEUED
+    stage: str = "queued"  # What it is doing right now
+    sql: str | None = None
+    error: str | None = None
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    result: JobResult | None = field(default=None, repr=False)
+    _task: asyncio.Task | None = field(default=None, repr=False)
+    _changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def update(self, **changes: Any) -> None:
+        """Change fields and wake up watchers."""
+        for name, value in changes.items():
+            setattr(self, name, value)
+        self.notify()
+
+    def notify(self) -> None:
+        """Wake up watchers (e.g. after more rows arrived)."""
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def watch(self) -> AsyncIterator[dict[str, Any]]:
+        """
+        The job's state now and after every change, until it finishes.
+
+        A slow watcher skips intermediate states rather than queueing them.
+        """
+        while True:
+            changed = self._changed
+            yield self.to_dict()
+            if self.finished:
+                return
+            await changed.wait()
+
+    def to_dict(self) -> dict[str, Any]:
+        result = self.result
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "request": self.request,
+            "status": self.status.value,
+            "stage": self.stage,
+            "sql": self.sql,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "row_count": result.row_count if result else 0,
+            "columns": result.columns if result else [],
+            "truncated": result.truncated if result else False,
+        }
+
+
+@dataclass
+class JobStats:
+    """Counters for the job scheduler."""
+    submitted: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    cancelled: int = 0
+    rejected: int = 0  # queue full
+    expired: int = 0
+    spilled: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+class JobScheduler:
+    """
+    Runs jobs in the background with bounded concurrency.
+
+    Usage:
+        scheduler = JobScheduler(max_concurrent=2)
+        scheduler.start()
+        job = scheduler.submit("sql", sql, lambda job: run_query(job, sql))
+        ...
+        await scheduler.aclose()
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 2,
+        max_queued: int = 100,
+        ttl: float = 3600.0,
+        spill_dir: str | None = None,
+        spill_bytes: int = 8 * 1024 * 1024,
+    ) -> None:
+        """
+        Args:
+            max_concurrent: Jobs running at once
+            max_queued: Jobs allowed to wait for a slot
+            ttl: Seconds a finished job (and its result) is kept
+            spill_dir: Where spilled results go (None = the system temp dir);
+                each scheduler uses its own subdirectory
+            spill_bytes: Result size kept in memory per job
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self.spill_bytes = spill_bytes
+        self.stats = JobStats()
+        self._spill_dir = tempfile.mkdtemp(prefix="cass-jobs-", dir=spill_dir or None)
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._jobs: dict[str, Job] = {}
+        self._reaper: asyncio.Task | None = None
+
+    def start(self) -> None:
+        """Start dropping expired jobs in the background."""
+        if self._reaper is None:
+            self._reaper = asyncio.create_task(self._reap_expired())
+
+    def counts(self) -> dict[str, int]:
+        """Jobs waiting, running and kept (finished), for /stats."""
+        counts = {"queued": 0, "running": 0, "stored": 0}
+        for job in self._jobs.values():
+            if job.status is JobStatus.QUEUED:
+                counts["queued"] += 1
+            elif job.status is JobStatus.RUNNING:
+                counts["running"] += 1
+            else:
+                counts["stored"] += 1
+        return counts
+
+    def submit(self, kind: str, request: str, work: Callable[[Job], Awaitable[None]]) -> Job:
+        """
+        Queue a job; work(job) runs once a slot is free.
+
+        work reports progress through job.update() and adds rows to
+        job.result. It succeeds by returning and fails by raising; the
+        exception message becomes job.error.
+
+        Raises:
+            QueueFullError: Too many jobs are waiting already
+        """
+        queued = sum(1 for job in self._jobs.values() if job.status is JobStatus.QUEUED)
+        if queued >= self.max_queued:
+            self.stats.rejected += 1
+            raise QueueFullError("Too many jobs waiting", retry_after=5)
+
+        job_id = uuid.uuid4().hex
+        job = Job(id=job_id, kind=kind, request=request)
+        job.result = JobResult(os.path.join(self._spill_dir, f"{job_id}.jsonl"), self.spill_bytes)
+        self._jobs[job_id] = job
+        job._task = asyncio.create_task(self._run(job, work))
+        self.stats.submitted += 1
+        return job
+
+    async def _run(self, job: Job, work: Callable[[Job], Awaitable[None]]) -> None:
+        try:
+            async with self._slots:
+                job.update(status=JobStatus.RUNNING, stage="running", started_at=time.time())
+                await work(job)
+        except asyncio.CancelledError:
+            self._finish(job, JobStatus.CANCELLED, "cancelled")
+        except Exception as e:
+            self._finish(job, JobStatus.FAILED, "failed", error=str(e))
+        else:
+            self._finish(job, JobStatus.SUCCEEDED, "done")
+
+    def _finish(self, job: Job, status: JobStatus, stage: str, error: str | None = None) -> None:
+        if status is JobStatus.SUCCEEDED:
+            self.stats.succeeded += 1
+            if job.result is not None and job.result.spilled:
+                self.stats.spilled += 1
+        else:
+            if status is JobStatus.CANCELLED:
+                self.stats.cancelled += 1
+            else:
+                self.stats.failed += 1
+            # Partial rows are of no use
+            if job.result is not None:
+                job.result.delete()
+        job.update(status=status, stage=stage, error=error or job.error, finished_at=time.time())
+
+    def get(self, job_id: str) -> Job | None:
+        return self._jobs.get(job_id)
+
+    async def cancel(self, job_id: str) -> Job | None:
+        """Cancel a queued or running job and wait until it has stopped."""
+        job = self._jobs.get(job_id)
+        if job is None or job._task is None:
+            return job
+        if not job.finished:
+            job._task.cancel()
+            await asyncio.wait([job._task])
+        return job
+
+    def delete(self, job_id: str) -> bool:
+        """Forget a finished job and its result; returns whether it existed."""
+        job = self._jobs.get(job_id)
+        if job is None or not job.finished:
+            return False
+        del self._jobs[job_id]
+        if job.result is not None:
+            job.result.delete()
+        return True
+
+    async def _reap_expired(self) -> None:
+        while True:
+            await asyncio.sleep(min(self.ttl, 60.0))
+            cutoff = time.time() - self.ttl
+            for job in list(self._jobs.values()):
+                if job.finished and job.finished_at is not None and job.finished_at < cutoff:
+                    self.delete(job.id)
+                    self.stats.expired += 1
+
+    async def aclose(self) -> None:
+        """Cancel every unfinished job and remove the spill files."""
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        tasks = [job._task for job in self._jobs.values() if job._task is not None]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks)
+        self._jobs.clear()
+        shutil.rmtree(self._spill_dir, ignore_errors=True)
@@ -28,11 +28,21 @@ class LlmProvider(ABC):
     """
 
     @abstractmethod
-    async def chat(self, messages: list[LlmMessage]) -> LlmResponse:
-        """Send messages to the LLM and get a response."""
+    async def chat(
+        self, messages: list[LlmMessage], temperature: float | None = None
+    ) -> LlmResponse:
+        """
+        Send messages to the LLM and get a response.
+
+        temperature overrides the model's default sampling temperature.
+        """
         pass
 
     @abstractmethod
     async def chat_stream(self, messages: list[LlmMessage]) -> AsyncIterator[str]:
         """Send messages and stream the response token by token."""
         pass
+
+    async def aclose(self) -> None:
+        """Release resources held by the provider (e.g. pooled HTTP connections)."""
+        pass
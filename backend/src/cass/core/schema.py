@@ -0,0 +1,56 @@
+"""
+Schema Model for CASS
+=====================
+Structured description of the database schema, shared by the database
+runner (which loads it) and the agent-side stages that use it.
+"""
+
+from dataclasses import dataclass, field
+
+
+@dataclass
+class ColumnInfo:
+    """A single column of a table or view."""
+    name: str
+    data_type: str
+    nullable: bool = True
+    comment: str | None = None
+
+
+@dataclass
+class ForeignKey:
+    """
+    A foreign key from `columns` to `ref_columns` of `ref_table`, pairwise
+    (one of each for a single-column key).
+    """
+    columns: list[str]
+    ref_table: str
+    ref_columns: list[str]
+
+
+@dataclass
+class TableInfo:
+    """A table (or view) with its columns, comment and foreign keys."""
+    name: str
+    columns: list[ColumnInfo] = field(default_factory=list)
+    comment: str | None = None
+    foreign_keys: list[ForeignKey] = field(default_factory=list)
+
+
+def render_table(table: TableInfo) -> str:
+    """Format one table as readable text for the LLM."""
+    lines = [f"Table: {table.name}"]
+    for column in table.columns:
+        nullable = "NULL" if column.nullable else "NOT NULL"
+        lines.append(f"  - {column.name} ({column.data_type}, {nullable})")
+    return "\n".join(lines)
+
+
+def render_schema(tables: list[TableInfo]) -> str:
+    """Format tables as readable text for the LLM (blank line between tables)."""
+    return "\n\n".join(render_table(table) for table in tables)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for prompt budgeting (~4 characters per token)."""
+    return (len(text) + 3) // 4
@@ -0,0 +1,234 @@
+"""
+Schema Selection for CASS
+=========================
+Picks the tables relevant to a question so the prompt only carries the part
+of the schema the LLM actually needs.
+
+An in-memory inverted index is built over table names, column names,
+comments and foreign keys. Each question is scored against it (TF-IDF
+style), the top-K tables are taken, their FK neighbours are added, and the
+result is rendered within a token budget.
+"""
+
+import math
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from cass.core.schema import TableInfo, estimate_tokens, render_schema, render_table
+
+# Where a term was found, and how much a match there counts
+NAME_WEIGHT = 3.0
+COLUMN_WEIGHT = 1.5
+COMMENT_WEIGHT = 1.0
+# Bonus when every word of a table name appears in the question
+EXACT_NAME_BONUS = 6.0
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_CAMEL_RE = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from how in is it many me much of on or our "
+    "show the their there this to was what which who with all list give get "
+    "find tell do does did per each top most least".split()
+)
+
+
+def _stem(word: str) -> str:
+    """Very small plural stemmer (orders -> order, categories -> category)."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith(("ses", "xes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> list[str]:
+    """Split identifiers and prose into normalized index terms."""
+    text = _CAMEL_RE.sub(" ", text).lower()
+    return [
+        _stem(word)
+        for word in _WORD_RE.findall(text)
+        if word not in _STOPWORDS
+    ]
+
+
+@dataclass
+class SchemaSelection:
+    """Tables chosen for a question, and the schema text built from them."""
+    text: str
+    tables: list[str]
+    scores: dict[str, float] = field(default_factory=dict)
+    pruned: bool = False
+    tokens: int = 0
+    version: str | None = None  # Schema version the selection was made from
+    stats_tokens: int = 0  # Part of tokens spent on table statistics
+
+
+class SchemaIndex:
+    """
+    Inverted index over the schema for relevance-based table selection.
+
+    Usage:
+        index = SchemaIndex(tables)
+        selection = index.select("top 10 products by revenue", top_k=5)
+        print(selection.tables, selection.text)
+    """
+
+    def __init__(self, tables: list[TableInfo]) -> None:
+        self.tables = {table.name: table for table in tables}
+        self._order = [table.name for table in tables]
+        self._position = {name: i for i, name in enumerate(self._order)}
+        self._rendered = {table.name: render_table(table) for table in tables}
+        self._postings: dict[str, dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self._neighbours: dict[str, set[str]] = defaultdict(set)
+        self._name_terms = {table.name: frozenset(tokenize(table.name)) for table in tables}
+
+        for table in tables:
+            self._add(table.name, table.name, NAME_WEIGHT)
+            if table.comment:
+                self._add(table.name, table.comment, COMMENT_WEIGHT)
+            for column in table.columns:
+                self._add(table.name, column.name, COLUMN_WEIGHT)
+                if column.comment:
+                    self._add(table.name, column.comment, COMMENT_WEIGHT)
+            for fk in table.foreign_keys:
+                self._neighbours[table.name].add(fk.ref_table)
+                self._neighbours[fk.ref_table].add(table.name)
+
+        total = max(len(tables), 1)
+        self._idf = {
+            term: math.log(1 + total / len(postings))
+            for term, postings in self._postings.items()
+        }
+        self._full_text = render_schema(tables)
+        self._full_tokens = estimate_tokens(self._full_text)
+
+    def _add(self, table: str, text: str, weight: float) -> None:
+        for term in tokenize(text):
+            # Keep the strongest evidence per (term, table)
+            postings = self._postings[term]
+            postings[table] = max(postings[table], weight)
+
+    def score(self, question: str) -> dict[str, float]:
+        """Score every table that shares at least one term with the question."""
+        terms = set(tokenize(question))
+        scores: dict[str, float] = defaultdict(float)
+        for term in terms:
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf[term]
+            for table, weight in postings.items():
+                scores[table] += weight * idf
+
+        for table in scores:
+            name_terms = self._name_terms[table]
+            if name_terms and name_terms <= terms:
+                scores[table] += EXACT_NAME_BONUS
+        return dict(scores)
+
+    def select(
+        self,
+        question: str,
+        top_k: int = 8,
+        token_budget: int = 2000,
+        keep: Iterable[str] = (),
+    ) -> SchemaSelection:
+        """
+        Choose the tables to send with a question.
+
+        Args:
+            question: The user's natural-language question
+            top_k: Maximum number of directly matching tables
+            token_budget: Approximate token limit for the rendered schema
+            keep: Tables chosen earlier in the conversation; they are kept
+                (budget permitting) so the schema text stays the same
+
+        Returns:
+            SchemaSelection with the rendered text and the chosen table names.
+            If the whole schema fits in the budget, or nothing matches (and
+            nothing is kept), the full schema is returned unpruned.
+        """
+        scores = self.score(question)
+        keep = [name for name in keep if name in self.tables]
+        if self._full_tokens <= token_budget or not (scores or keep):
+            return SchemaSelection(
+                text=self._full_text,
+                tables=list(self._order),
+                scores=scores,
+                pruned=False,
+                tokens=self._full_tokens,
+            )
+
+        ranked = sorted(scores, key=lambda name: (-scores[name], name))[:top_k]
+
+        # FK neighbours come after the direct matches, best-connected first
+        neighbours: dict[str, float] = {}
+        for name in ranked:
+            for other in self._neighbours.get(name, ()):
+                if other in self.tables and other not in ranked:
+                    neighbours[other] = max(neighbours.get(other, 0.0), scores[name])
+        candidates = ranked + sorted(neighbours, key=lambda name: (-neighbours[name], name))
+        candidates = keep + [name for name in candidates if name not in keep]
+
+        chosen: list[str] = []
+        used = 0
+        for name in candidates:
+            cost = estimate_tokens(self._rendered[name]) + 1
+            if chosen and used + cost > token_budget:
+                continue
+            chosen.append(name)
+            used += cost
+
+        # Render in catalog order so the prompt is stable across questions
+        chosen.sort(key=self._position.__getitem__)
+        text = "\n\n".join(self._rendered[name] for name in chosen)
+        return SchemaSelection(
+            text=text,
+            tables=chosen,
+            scores={name: scores.get(name, 0.0) for name in chosen},
+            pruned=True,
+            tokens=estimate_tokens(text),
+        )
+
+
+class SchemaSelector:
+    """
+    Keeps a SchemaIndex per schema version and runs selections against it.
+
+    Usage:
+        selector = SchemaSelector(top_k=8, token_budget=2000)
+        selection = selector.select(snapshot.version, snapshot.tables, question)
+    """
+
+    def __init__(self, top_k: int = 8, token_budget: int = 2000) -> None:
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self._version: str | None = None
+        self._index: SchemaIndex | None = None
+
+    def index_for(self, version: str, tables: list[TableInfo]) -> SchemaIndex:
+        """Return the index for this schema version, rebuilding it if needed."""
+        if self._index is None or self._version != version:
+            self._index = SchemaIndex(tables)
+            self._version = version
+        return self._index
+
+    def select(
+        self,
+        version: str,
+        tables: list[TableInfo],
+        question: str,
+        keep: Iterable[str] = (),
+    ) -> SchemaSelection:
+        """Select the relevant part of the schema for a question."""
+        index = self.index_for(version, tables)
+        selection = index.select(
+            question, top_k=self.top_k, token_budget=self.token_budget, keep=keep
+        )
+        selection.version = version
+        return selection
@@ -0,0 +1,302 @@
+"""
+Conversation Sessions for CASS
+==============================
+Keeps a compact history per session ID so follow-up questions ("and per
+month?") have context, without re-sending whole transcripts.
+
+- A turn is stored as question, SQL and a one-line result summary, never
+  the result rows
+- History is bounded by a token budget. When a new turn pushes it over,
+  the oldest turns are dropped until it is back under half the budget.
+  Trimming in blocks like this keeps the prompt prefix (system prompt,
+  schema, older turns) identical from one turn to the next, so Ollama can
+  reuse its KV cache for it instead of re-reading the whole prompt
+- The tables sent as schema context stick to the session, so the schema
+  part of the prefix doesn't change with every question either
+
+Stores:
+- InMemorySessionStore: LRU with a TTL, per process
+- SqliteSessionStore: a SQLite file, so sessions survive restarts and are
+  shared by the workers on one host
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+from cass.core.llm import LlmMessage, Role
+from cass.core.schema import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Characters of the first result row kept in a turn's summary
+_SAMPLE_CHARS = 120
+
+
+@dataclass
+class Turn:
+    """One question and what came of it."""
+    question: str
+    sql: str | None = None
+    summary: str = ""  # e.g. "3 rows (state, revenue); first: ['CA', 1200.5]"
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.question) + estimate_tokens(self.sql or "") + estimate_tokens(self.summary)
+
+
+@dataclass
+class Session:
+    """A conversation: its trimmed history and the tables it has been using."""
+    id: str
+    turns: list[Turn] = field(default_factory=list)
+    tables: list[str] = field(default_factory=list)
+    updated_at: float = field(default_factory=time.time)
+
+    def add_turn(self, turn: Turn, token_budget: int, max_turns: int) -> None:
+        """
+        Append a turn, dropping old ones in a block once over budget.
+
+        The new turn is always kept, even if it alone is over the budget.
+        """
+        self.turns.append(turn)
+        if len(self.turns) > max_turns or self.history_tokens > token_budget:
+            while len(self.turns) > 1 and (
+                len(self.turns) > max_turns // 2 or self.history_tokens > token_budget // 2
+            ):
+                self.turns.pop(0)
+        self.updated_at = time.time()
+
+    @property
+    def history_tokens(self) -> int:
+        return sum(turn.tokens for turn in self.turns)
+
+    def history_messages(self) -> list[LlmMessage]:
+        """The turns as alternating user/assistant messages, oldest first."""
+        messages = []
+        for turn in self.turns:
+            messages.append(LlmMessage(role=Role.USER, content=turn.question))
+            answer = f"```sql\n{turn.sql}\n```" if turn.sql else "(no SQL)"
+            if turn.summary:
+                answer += f"\nResult: {turn.summary}"
+            messages.append(LlmMessage(role=Role.ASSISTANT, content=answer))
+        return messages
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "Session":
+        return cls(
+            id=data["id"],
+            turns=[Turn(**turn) for turn in data.get("turns", [])],
+            tables=data.get("tables", []),
+            updated_at=data.get("updated_at", time.time()),
+        )
+
+
+def summarize_result(data: Any, error: str | None = None, row_count: int | None = None) -> str:
+    """
+    One-line summary of a query result for the session history.
+
+    Args:
+        data: Rows (list of dicts) or a ColumnarResult
+        error: The error, if the query failed
+        row_count: Total rows, when data holds only the first few
+    """
+    if error:
+        return f"error: {error.splitlines()[0][:_SAMPLE_CHARS]}"
+    if data is None:
+        return ""
+    if isinstance(data, list):
+        count = len(data)
+        columns = list(data[0]) if data else []
+        first = list(data[0].values()) if data else None
+    else:  # ColumnarResult
+        count = data.row_count
+        columns = data.columns
+        first = [column[0] for column in data.data] if count else None
+    if row_count is not None:
+        count = row_count
+    summary = f"{count} row{'s' if count != 1 else ''}"
+    if columns:
+        summary += f" ({', '.join(columns)})"
+    if first is not None:
+        sample = repr([str(value) if not isinstance(value, (int, float)) else value for value in first])
+        summary += f"; first: {sample[:_SAMPLE_CHARS]}"
+    return summary
+
+
+@dataclass
+class SessionStoreStats:
+    """Counters for a session store."""
+    loads: int = 0
+    misses: int = 0  # new or expired sessions
+    saves: int = 0
+    evictions: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+class SessionStore(ABC):
+    """Loads and saves sessions by ID."""
+
+    @abstractmethod
+    async def get(self, session_id: str) -> Session:
+        """The session, or a new empty one if it doesn't exist (or expired)."""
+        pass
+
+    @abstractmethod
+    async def save(self, session: Session) -> None:
+        pass
+
+    @abstractmethod
+    async def delete(self, session_id: str) -> bool:
+        """Forget a session; returns whether it existed."""
+        pass
+
+    def start(self) -> None:
+        """Start any background upkeep (call from a running event loop)."""
+        pass
+
+    async def aclose(self) -> None:
+        pass
+
+
+class InMemorySessionStore(SessionStore):
+    """LRU of sessions with an idle TTL."""
+
+    def __init__(self, max_sessions: int = 1000, ttl: float = 86400.0) -> None:
+        """
+        Args:
+            max_sessions: Sessions kept; the least recently used are evicted
+            ttl: Seconds a session may stay idle before it is forgotten
+        """
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.stats = SessionStoreStats()
+        self._sessions: OrderedDict[str, Session] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _expired(self, session: Session) -> bool:
+        return time.time() - session.updated_at > self.ttl
+
+    def _cached(self, session_id: str) -> Session | None:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        if self._expired(session):
+            del self._sessions[session_id]
+            return None
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def _remember(self, session: Session) -> None:
+        self._sessions[session.id] = session
+        self._sessions.move_to_end(session.id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.stats.evictions += 1
+
+    async def get(self, session_id: str) -> Session:
+        self.stats.loads += 1
+        session = self._cached(session_id)
+        if session is None:
+            self.stats.misses += 1
+            session = Session(id=session_id)
+        return session
+
+    async def save(self, session: Session) -> None:
+        self.stats.saves += 1
+        self._remember(session)
+
+    async def delete(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+
+class SqliteSessionStore(SessionStore):
+    """Sessions in a SQLite file; every get reads it, so workers see each other's turns."""
+
+    def __init__(self, path: str, ttl: float = 86400.0) -> None:
+        """
+        Args:
+            path: Database file (created if missing)
+            ttl: Seconds a session may stay idle before it is forgotten
+        """
+        self.path = path
+        self.ttl = ttl
+        self.stats = SessionStoreStats()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        # One connection, used from worker threads one call at a time
+        self._lock = asyncio.Lock()
+        self._pruner: asyncio.Task | None = None
+
+    def start(self) -> None:
+        """Start deleting expired sessions in the background."""
+        if self._pruner is None:
+            self._pruner = asyncio.create_task(self._prune_expired())
+
+    async def _run(self, sql: str, *params: Any) -> list[tuple]:
+        async with self._lock:
+            return await asyncio.to_thread(lambda: self._conn.execute(sql, params).fetchall())
+
+    async def get(self, session_id: str) -> Session:
+        self.stats.loads += 1
+        rows = await self._run(
+            "SELECT data FROM sessions WHERE id = ? AND updated_at >= ?",
+            session_id, time.time() - self.ttl,
+        )
+        if not rows:
+            self.stats.misses += 1
+            return Session(id=session_id)
+        return Session.from_dict(json.loads(rows[0][0]))
+
+    async def save(self, session: Session) -> None:
+        self.stats.saves += 1
+        await self._run(
+            "INSERT INTO sessions (id, data, updated_at) VALUES (?, ?, ?)"
+            " ON CONFLICT (id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+            session.id, json.dumps(session.to_dict()), session.updated_at,
+        )
+
+    async def delete(self, session_id: str) -> bool:
+        rows = await self._run("DELETE FROM sessions WHERE id = ? RETURNING id", session_id)
+        return bool(rows)
+
+    async def prune(self) -> int:
+        """Delete sessions idle for longer than the TTL; returns how many."""
+        rows = await self._run(
+            "DELETE FROM sessions WHERE updated_at < ? RETURNING id", time.time() - self.ttl
+        )
+        self.stats.evictions += len(rows)
+        return len(rows)
+
+    async def _prune_expired(self) -> None:
+        while True:
+            await asyncio.sleep(min(self.ttl, 60.0))
+            try:
+                await self.prune()
+            except Exception:
+                logger.exception("Could not prune expired sessions")
+
+    async def aclose(self) -> None:
+        if self._pruner is not None:
+            self._pruner.cancel()
+            self._pruner = None
+        async with self._lock:
+            self._conn.close()
@@ -0,0 +1,457 @@
+"""
+Shared Caches for CASS
+======================
+Byte stores for the second tier of the schema and result caches. They let
+the workers of a multi-process server use what another worker has already
+loaded, instead of each one warming its own copy.
+
+Each worker keeps its in-process caches (SchemaCache, QueryResultCache) as
+the first tier. A miss there is looked up in the CacheBackend before going
+to the database, and whatever a worker loads is written back for the
+others. Values are pickled, so the backend must be as trusted as the
+database itself.
+
+Backends:
+- InProcessCache: LRU with TTLs inside one process (no sharing; for scripts
+  and tests)
+- SqliteCache: a SQLite file shared by the workers on one host; on a tmpfs
+  path such as /dev/shm it is a shared-memory cache. The file must belong to
+  this user and not be accessible to others (see private_cache_dir())
+- RedisCache: a Redis-compatible server (Redis, Valkey, KeyDB...), shared by
+  workers on any number of hosts; needs the redis package
+
+Backend errors are logged and counted, never raised: a lookup that fails is
+a miss, and a store that fails is skipped. A backend too busy to answer
+quickly (CacheBusy) is counted the same way without a log line.
+"""
+
+import asyncio
+import logging
+import os
+import pickle
+import sqlite3
+import stat
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any
+
+try:
+    from redis import asyncio as aioredis
+except ImportError:  # RedisCache is unavailable
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+# Seconds between log lines about a failing backend
+_ERROR_LOG_INTERVAL = 60.0
+
+
+class CacheBusy(Exception):
+    """The backend could not answer without waiting; the call counts as a miss."""
+
+
+def _check_private(path: str, st: os.stat_result) -> None:
+    """Raise unless `st` is ours and closed to other users."""
+    if st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise RuntimeError(
+            f"{path} must be owned by this user and not accessible to others "
+            "(the cache unpickles what it reads)"
+        )
+
+
+def private_cache_dir() -> str:
+    """
+    A directory only this user can use, for the default SQLite cache file.
+
+    $XDG_RUNTIME_DIR when set (a per-user tmpfs), otherwise cass-<uid> in
+    /dev/shm (or the temp dir), created with mode 0700. Every worker of the
+    server resolves the same directory.
+
+    Raises:
+        RuntimeError: The directory exists but belongs to someone else, is
+            accessible to others, or is not a directory
+    """
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime and os.path.isdir(runtime):
+        _check_private(runtime, os.stat(runtime))
+        return runtime
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    path = os.path.join(base, f"cass-{os.getuid()}")
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    st = os.lstat(path)  # not following a symlink planted by someone else
+    if not stat.S_ISDIR(st.st_mode):
+        raise RuntimeError(f"{path} is not a directory")
+    _check_private(path, st)
+    return path
+
+
+def pack(value: Any) -> bytes | None:
+    """Pickle a value for a backend (None if it can't be pickled)."""
+    try:
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, TypeError, AttributeError):
+        return None
+
+
+def unpack(data: bytes) -> Any | None:
+    """Unpickle a value from a backend (None if it is unreadable)."""
+    try:
+        return pickle.loads(data)
+    except Exception:
+        return None
+
+
+@dataclass
+class CacheBackendStats:
+    """Counters for a cache backend."""
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    too_large: int = 0  # values over max_value_bytes, not stored
+    deletes: int = 0
+    busy: int = 0  # calls skipped because the backend was locked
+    errors: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def as_dict(self) -> dict[str, float]:
+        return {**asdict(self), "hit_rate": self.hit_rate}
+
+
+class CacheBackend(ABC):
+    """
+    Bytes by key, each with a TTL.
+
+    Keys are prefixed with the namespace, so several deployments (or
+    databases) can share one server.
+    """
+
+    kind = ""
+    shared = True  # visible to other processes
+
+    def __init__(self, namespace: str = "cass", max_value_bytes: int = 8 * 1024 * 1024) -> None:
+        """
+        Args:
+            namespace: Prefix of every key
+            max_value_bytes: Larger values are not stored
+        """
+        self.namespace = namespace
+        self.max_value_bytes = max_value_bytes
+        self.stats = CacheBackendStats()
+        self._last_error_log = 0.0
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _failed(self, action: str, error: Exception) -> None:
+        self.stats.errors += 1
+        now = time.monotonic()
+        if now - self._last_error_log >= _ERROR_LOG_INTERVAL:
+            self._last_error_log = now
+            logger.warning("%s cache %s failed: %s", self.kind, action, error)
+
+    async def get(self, key: str) -> bytes | None:
+        """The value, or None if it is missing, expired or the backend failed."""
+        try:
+            value = await self._get(self._key(key))
+        except CacheBusy:
+            self.stats.busy += 1
+            value = None
+        except Exception as e:
+            self._failed("get", e)
+            value = None
+        if value is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        """Store a value for `ttl` seconds."""
+        if ttl <= 0:
+            return
+        if len(value) > self.max_value_bytes:
+            self.stats.too_large += 1
+            return
+        try:
+            await self._set(self._key(key), value, ttl)
+            self.stats.stores += 1
+        except CacheBusy:
+            self.stats.busy += 1
+        except Exception as e:
+            self._failed("set", e)
+
+    async def delete(self, key: str) -> None:
+        try:
+            await self._delete(self._key(key))
+            self.stats.deletes += 1
+        except CacheBusy:
+            self.stats.busy += 1
+        except Exception as e:
+            self._failed("delete", e)
+
+    async def clear(self, prefix: str = "") -> None:
+        """Delete the keys (of this namespace) starting with `prefix`."""
+        try:
+            await self._clear(self._key(prefix))
+        except CacheBusy:
+            self.stats.busy += 1
+        except Exception as e:
+            self._failed("clear", e)
+
+    @abstractmethod
+    async def _get(self, key: str) -> bytes | None:
+        pass
+
+    @abstractmethod
+    async def _set(self, key: str, value: bytes, ttl: float) -> None:
+        pass
+
+    @abstractmethod
+    async def _delete(self, key: str) -> None:
+        pass
+
+    @abstractmethod
+    async def _clear(self, prefix: str) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        pass
+
+
+class InProcessCache(CacheBackend):
+    """LRU of values with expiry times, in this process only."""
+
+    kind = "memory"
+    shared = False
+
+    def __init__(
+        self,
+        max_entries: int = 10_000,
+        max_bytes: int = 256 * 1024 * 1024,
+        namespace: str = "cass",
+        max_value_bytes: int = 8 * 1024 * 1024,
+    ) -> None:
+        """
+        Args:
+            max_entries: Values kept; the least recently used are evicted
+            max_bytes: Total size of the values kept
+            namespace: Prefix of every key
+            max_value_bytes: Larger values are not stored
+        """
+        super().__init__(namespace, max_value_bytes)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # key -> (value, monotonic expiry time)
+        self._entries: OrderedDict[str, tuple[bytes, float]] = OrderedDict()
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def _get(self, key: str) -> bytes | None:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        if time.monotonic() >= item[1]:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return item[0]
+
+    async def _set(self, key: str, value: bytes, ttl: float) -> None:
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._bytes += len(value)
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            self._remove(next(iter(self._entries)))
+
+    async def _delete(self, key: str) -> None:
+        if key in self._entries:
+            self._remove(key)
+
+    async def _clear(self, prefix: str) -> None:
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        value, _ = self._entries.pop(key)
+        self._bytes -= len(value)
+
+
+class SqliteCache(CacheBackend):
+    """
+    Values in a SQLite file (WAL mode), shared by the processes that open it.
+
+    Expired rows are skipped on read and pruned every `prune_every` stores,
+    which also drops the rows expiring soonest once there are more than
+    max_entries.
+
+    The file is created with mode 0600, and an existing file (or WAL file)
+    that belongs to another user or is open to others is refused: values are
+    unpickled, so whoever can write the file could run code in the server.
+
+    Calls share one connection, so each waits at most `busy_timeout` for
+    another process's write lock and then gives up (a miss, or a skipped
+    store) rather than holding up every cache call in this worker.
+    """
+
+    kind = "sqlite"
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 10_000,
+        namespace: str = "cass",
+        max_value_bytes: int = 8 * 1024 * 1024,
+        prune_every: int = 200,
+        busy_timeout: float = 0.05,
+    ) -> None:
+        """
+        Args:
+            path: Database file (created if missing); put it on a tmpfs
+                (e.g. /dev/shm/cass_cache.db) to keep it in memory
+            max_entries: Rows kept after a prune
+            namespace: Prefix of every key
+            max_value_bytes: Larger values are not stored
+            prune_every: Stores between prunes
+            busy_timeout: Seconds to wait for a lock held by another process
+
+        Raises:
+            RuntimeError: The file is not private to this user
+        """
+        super().__init__(namespace, max_value_bytes)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+        try:
+            _check_private(path, os.fstat(fd))
+        finally:
+            os.close(fd)
+        for suffix in ("-wal", "-shm"):
+            if os.path.lexists(path + suffix):
+                _check_private(path + suffix, os.lstat(path + suffix))
+        self.path = path
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=OFF")  # a cache can lose writes on a crash
+        self._conn.execute(f"PRAGMA busy_timeout={max(int(busy_timeout * 1000), 0)}")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+        # One connection, used from worker threads one call at a time
+        self._lock = asyncio.Lock()
+        self._stores = 0
+
+    async def _run(self, sql: str, *params: Any) -> list[tuple]:
+        async with self._lock:
+            try:
+                return await asyncio.to_thread(lambda: self._conn.execute(sql, params).fetchall())
+            except sqlite3.OperationalError as e:
+                if "locked" in str(e):  # SQLITE_BUSY / SQLITE_LOCKED
+                    raise CacheBusy(str(e)) from e
+                raise
+
+    async def _get(self, key: str) -> bytes | None:
+        rows = await self._run(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", key, time.time()
+        )
+        return rows[0][0] if rows else None
+
+    async def _set(self, key: str, value: bytes, ttl: float) -> None:
+        await self._run(
+            "INSERT INTO cache (key, value, expires_at) VALUES (?, ?, ?)"
+            " ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+            key, value, time.time() + ttl,
+        )
+        self._stores += 1
+        if self._stores % self.prune_every == 0:
+            await self.prune()
+
+    async def _delete(self, key: str) -> None:
+        await self._run("DELETE FROM cache WHERE key = ?", key)
+
+    async def _clear(self, prefix: str) -> None:
+        await self._run("DELETE FROM cache WHERE substr(key, 1, ?) = ?", len(prefix), prefix)
+
+    async def prune(self) -> None:
+        """Delete expired rows, then the soonest to expire past max_entries."""
+        await self._run("DELETE FROM cache WHERE expires_at <= ?", time.time())
+        await self._run(
+            "DELETE FROM cache WHERE key IN ("
+            " SELECT key FROM cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            self.max_entries,
+        )
+
+    async def aclose(self) -> None:
+        async with self._lock:
+            self._conn.close()
+
+
+class RedisCache(CacheBackend):
+    """Values in a Redis-compatible server, with its own key expiry (SET PX)."""
+
+    kind = "redis"
+
+    def __init__(
+        self,
+        url: str,
+        namespace: str = "cass",
+        max_value_bytes: int = 8 * 1024 * 1024,
+        timeout: float = 0.5,
+    ) -> None:
+        """
+        Args:
+            url: Server URL, e.g. "redis://localhost:6379/0"
+            namespace: Prefix of every key
+            max_value_bytes: Larger values are not stored
+            timeout: Seconds to wait for the server before treating a call
+                as failed (a slow cache must not slow down requests)
+
+        Raises:
+            RuntimeError: The redis package is not installed
+        """
+        if aioredis is None:
+            raise RuntimeError("The redis cache backend needs the redis package (pip install redis)")
+        super().__init__(namespace, max_value_bytes)
+        self.url = url
+        self._client = aioredis.from_url(
+            url, socket_timeout=timeout, socket_connect_timeout=timeout
+        )
+
+    async def _get(self, key: str) -> bytes | None:
+        return await self._client.get(key)
+
+    async def _set(self, key: str, value: bytes, ttl: float) -> None:
+        await self._client.set(key, value, px=max(int(ttl * 1000), 1))
+
+    async def _delete(self, key: str) -> None:
+        await self._client.delete(key)
+
+    async def _clear(self, prefix: str) -> None:
+        pattern = "".join(f"\\{char}" if char in "*?[]\\" else char for char in prefix) + "*"
+        batch: list[bytes] = []
+        async for key in self._client.scan_iter(match=pattern, count=500):
+            batch.append(key)
+            if len(batch) >= 500:
+                await self._client.delete(*batch)
+                batch = []
+        if batch:
+            await self._client.delete(*batch)
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
@@ -0,0 +1,177 @@
+"""
+Request Coalescing for CASS
+===========================
+When many clients ask the same question at the same moment (a dashboard
+refresh, say), only the first request does the work; the others attach to
+it and get the same result.
+
+- SingleFlight: identical in-flight calls share one task
+- StreamFanout: identical in-flight streams share one source iterator;
+  subscribers that join late first replay what was already produced
+"""
+
+import asyncio
+import weakref
+from contextlib import aclosing
+from functools import partial
+from dataclasses import asdict, dataclass
+from typing import AsyncIterator, Awaitable, Callable, Generic, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class CoalescingStats:
+    """How many requests did the work and how many piggybacked on them."""
+    leaders: int = 0
+    followers: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+def _consume_exception(task: asyncio.Future) -> None:
+    """Avoid 'exception was never retrieved' when every caller went away."""
+    if not task.cancelled():
+        task.exception()
+
+
+class SingleFlight(Generic[T]):
+    """
+    Deduplicates concurrent calls with the same key.
+
+    Usage:
+        flights = SingleFlight()
+        result = await flights.do(key, lambda: expensive(...))
+    """
+
+    def __init__(self) -> None:
+        self.stats = CoalescingStats()
+        self._calls: dict[Hashable, asyncio.Future[T]] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run fn(), or wait for the identical call already in flight.
+
+        The shared call keeps running if a caller is cancelled, so one
+        client disconnecting doesn't fail the others.
+        """
+        call = self._calls.get(key)
+        if call is None:
+            self.stats.leaders += 1
+            call = asyncio.ensure_future(fn())
+            self._calls[key] = call
+            call.add_done_callback(_consume_exception)
+            call.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.stats.followers += 1
+        return await asyncio.shield(call)
+
+    def _forget(self, key: Hashable, call: asyncio.Future[T]) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+
+class _SharedStream(Generic[T]):
+    """
+    One source iterator, buffered so every subscriber sees all items.
+
+    The source is created and pumped once a subscriber starts iterating, and
+    cancelled when the last one that did stops. A subscription that is never
+    iterated holds nothing open.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], AsyncIterator[T]],
+        on_done: Callable[["_SharedStream[T]"], None],
+    ) -> None:
+        self._factory = factory
+        self._items: list[T] = []
+        self._error: BaseException | None = None
+        self._changed = asyncio.Event()
+        self._subscribers = 0
+        self._on_done = on_done
+        self.done = False
+        self._task: asyncio.Task | None = None
+
+    async def _pump(self, source: AsyncIterator[T]) -> None:
+        try:
+            async with aclosing(source) as items:
+                async for item in items:
+                    self._items.append(item)
+                    self._notify()
+        except Exception as e:
+            self._error = e
+        finally:
+            self.done = True
+            self._notify()
+            self._on_done(self)
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def subscribe(self) -> AsyncIterator[T]:
+        # Runs on the first iteration, not when the subscription is handed out
+        self._subscribers += 1
+        if self._task is None:
+            self._task = asyncio.create_task(self._pump(self._factory()))
+        position = 0
+        try:
+            while True:
+                while position < len(self._items):
+                    yield self._items[position]
+                    position += 1
+                if self.done:
+                    if self._error is not None:
+                        raise self._error
+                    return
+                await self._changed.wait()
+        finally:
+            self._subscribers -= 1
+            if self._subscribers == 0 and not self.done:
+                # Nobody is listening any more; stop the work (frees the LLM)
+                # and make sure nobody new joins the dying stream
+                self.done = True
+                self._on_done(self)
+                self._task.cancel()
+
+
+class StreamFanout(Generic[T]):
+    """
+    Shares one in-flight stream between identical requests.
+
+    Usage:
+        fanout = StreamFanout()
+        async for event in fanout.subscribe(key, lambda: make_stream(...)):
+            ...
+    """
+
+    def __init__(self) -> None:
+        self.stats = CoalescingStats()
+        # Weak, so a stream whose subscriptions were all dropped unread goes away
+        self._streams: weakref.WeakValueDictionary[Hashable, _SharedStream[T]] = (
+            weakref.WeakValueDictionary()
+        )
+
+    def __len__(self) -> int:
+        return len(self._streams)
+
+    def subscribe(self, key: Hashable, factory: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """Join the stream for `key`, starting it with factory() if needed."""
+        shared = self._streams.get(key)
+        if shared is None or shared.done:
+            self.stats.leaders += 1
+            shared = _SharedStream(factory, on_done=partial(self._forget, key))
+            self._streams[key] = shared
+        else:
+            self.stats.followers += 1
+        return shared.subscribe()
+
+    def _forget(self, key: Hashable, shared: _SharedStream[T]) -> None:
+        if self._streams.get(key) is shared:
+            del self._streams[key]
@@ -0,0 +1,97 @@
+"""
+SQL Extraction for CASS
+=======================
+Finds the ```sql block in an LLM answer.
+
+SqlBlockScanner works on the answer while it streams in: it looks for the
+opening and closing fences as tokens arrive (also when a fence is split
+across tokens) and reports as soon as the block is complete, so the caller
+can stop the generation and run the query without waiting for whatever the
+model says after it. Tokens are kept in a list and joined once, instead of
+growing one string per token.
+
+Usage:
+    scanner = SqlBlockScanner()
+    async for token in llm.chat_stream(messages):
+        if scanner.feed(token):
+            break
+    sql = scanner.sql
+"""
+
+_OPEN = "```sql"
+_CLOSE = "```"
+
+
+class SqlBlockScanner:
+    """Incrementally locates the first ```sql block in a streamed answer."""
+
+    def __init__(self) -> None:
+        self._parts: list[str] = []
+        self._length = 0
+        # The last few characters seen, so fences split across tokens match
+        self._tail = ""
+        self._start: int | None = None  # offset just after the opening fence
+        self._end: int | None = None  # offset of the closing fence
+        self._text: str | None = None
+
+    @property
+    def complete(self) -> bool:
+        """Whether the closing fence has been seen."""
+        return self._end is not None
+
+    def feed(self, token: str) -> bool:
+        """
+        Add the next token.
+
+        Returns:
+            True once the SQL block is complete; later tokens are ignored
+        """
+        if self._end is not None:
+            return True
+        self._parts.append(token)
+        self._text = None
+        window_start = self._length - len(self._tail)
+        window = self._tail + token
+        self._length += len(token)
+
+        if self._start is None:
+            found = window.lower().find(_OPEN)
+            if found < 0:
+                self._tail = window[-(len(_OPEN) - 1):]
+                return False
+            self._start = window_start + found + len(_OPEN)
+
+        found = window.find(_CLOSE, max(0, self._start - window_start))
+        if found < 0:
+            self._tail = window[-(len(_CLOSE) - 1):]
+            return False
+        self._end = window_start + found
+        return True
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far."""
+        if self._text is None:
+            self._text = "".join(self._parts)
+            self._parts = [self._text]
+        return self._text
+
+    @property
+    def sql(self) -> str | None:
+        """
+        The SQL in the block, or None without one.
+
+        A block that was never closed (the stream ended, or a stop sequence
+        ate the closing fence) runs to the end of the text.
+        """
+        if self._start is None:
+            return None
+        end = self._end if self._end is not None else self._length
+        return self.text[self._start:end].strip() or None
+
+
+def extract_sql(content: str) -> str | None:
+    """Extract the SQL from the first ```sql block of a complete answer."""
+    scanner = SqlBlockScanner()
+    scanner.feed(content)
+    return scanner.sql
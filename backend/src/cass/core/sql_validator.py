@@ -0,0 +1,434 @@
+"""
+SQL Validation for CASS
+=======================
+Checks generated SQL in-process, before it is sent to the database:
+
+- read-only: a single SELECT/WITH statement, with no data-modifying CTEs,
+  SELECT INTO, row locks or side-effecting functions
+- references: tables exist, alias.column pairs exist, and unqualified
+  columns exist in one of the tables in the query
+
+It works on tokens rather than a full SQL grammar, so the reference checks
+are deliberately conservative: anything it can't resolve with certainty
+(derived tables, CTEs, set-returning functions, other schemas) is left to
+the database to judge. Problems are returned as SqlIssue objects whose
+messages are written to be fed back to the LLM.
+"""
+
+import difflib
+import re
+from dataclasses import dataclass, field
+
+from cass.core.schema import TableInfo
+
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<comment>--[^\n]*|/\*.*?\*/)
+    | (?P<string>'(?:[^']|'')*'|\$(?P<tag>[a-zA-Z_]*)\$.*?\$(?P=tag)\$)
+    | (?P<ident>"(?:[^"]|"")*")
+    | (?P<param>\$\d+)
+    | (?P<number>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?|\.\d+)
+    | (?P<word>[a-zA-Z_][a-zA-Z0-9_$]*)
+    | (?P<op>::|<=|>=|<>|!=|\|\||[^\s])
+    | (?P<space>\s+)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+# Words that are never column references
+KEYWORDS = frozenset("""
+    select from where group by order having limit offset fetch first next rows
+    row only join inner left right full outer cross natural lateral on using
+    as and or not in is null isnull notnull like ilike similar to between
+    symmetric case when then else end distinct all any some exists union
+    intersect except with recursive materialized true false asc desc nulls
+    last over partition range groups preceding following unbounded current
+    filter within window interval date time timestamp timestamptz without
+    zone at escape collate default array cube rollup grouping sets ties
+    values table tablesample current_date current_time current_timestamp
+    localtime localtimestamp current_user session_user user epoch year month
+    day hour minute second week quarter dow doy isodow isoyear century decade
+    millennium microseconds milliseconds for of
+""".split())
+
+# Clauses that end a FROM list
+_FROM_END = frozenset(
+    "where group order having limit offset fetch window union intersect "
+    "except for on using".split()
+)
+
+# Statements (or data-modifying CTE bodies) that write
+WRITE_KEYWORDS = frozenset(
+    "insert update delete merge drop alter create truncate grant revoke copy "
+    "vacuum reindex cluster lock call do execute prepare set reset refresh "
+    "listen notify discard security comment".split()
+)
+
+# Statements that write rows; unlike the rest of WRITE_KEYWORDS, these are
+# rejected anywhere in the query (WITH x AS (...) DELETE ..., subqueries)
+_DML_KEYWORDS = frozenset({"insert", "update", "delete", "merge"})
+
+# Functions with side effects (or that can tie up the server)
+UNSAFE_FUNCTIONS = frozenset({
+    "nextval", "setval", "set_config", "pg_sleep", "pg_sleep_for",
+    "pg_sleep_until", "pg_terminate_backend", "pg_cancel_backend",
+    "pg_reload_conf", "pg_rotate_logfile", "pg_promote", "pg_switch_wal",
+    "pg_advisory_lock", "pg_advisory_xact_lock", "pg_advisory_lock_shared",
+    "pg_advisory_xact_lock_shared", "pg_try_advisory_lock",
+    "pg_try_advisory_xact_lock", "pg_try_advisory_lock_shared",
+    "pg_try_advisory_xact_lock_shared", "pg_notify", "pg_read_file",
+    "pg_read_binary_file", "pg_ls_dir", "lo_import", "lo_export", "lo_unlink",
+    "lo_create", "lo_creat", "lo_from_bytea", "lo_put", "lo_truncate",
+    "dblink", "dblink_exec",
+})
+
+# Schemas whose tables we don't know but are fine to read
+_OTHER_SCHEMAS = frozenset({"pg_catalog", "information_schema"})
+
+_READ_ONLY_START = frozenset({"select", "with", "values", "table"})
+
+
+@dataclass
+class Token:
+    kind: str  # word, ident, string, number, param, op
+    value: str  # words lowercased, quoted identifiers unquoted
+    start: int = 0  # offset in the SQL text
+
+
+@dataclass
+class SqlIssue:
+    """One problem found in a query."""
+    code: str  # not_read_only, multiple_statements, unknown_table, unknown_column, unknown_alias
+    message: str
+    table: str | None = None
+    column: str | None = None
+    suggestions: list[str] = field(default_factory=list)
+
+    def __str__(self) -> str:
+        if self.suggestions:
+            return f"{self.message} Did you mean: {', '.join(self.suggestions)}?"
+        return self.message
+
+
+def format_issues(issues: list[SqlIssue]) -> str:
+    """Render issues as a bullet list (for error messages and LLM retries)."""
+    return "\n".join(f"- {issue}" for issue in issues)
+
+
+def tokenize(sql: str) -> list[Token]:
+    """Split SQL into tokens, dropping whitespace and comments."""
+    tokens = []
+    for match in _TOKEN_RE.finditer(sql):
+        kind = match.lastgroup
+        if kind == "tag":  # group inside a dollar-quoted string
+            kind = "string"
+        if kind in ("comment", "space"):
+            continue
+        text = match.group()
+        if kind == "word":
+            text = text.lower()
+        elif kind == "ident":
+            text = text[1:-1].replace('""', '"')
+        tokens.append(Token(kind, text, match.start()))
+    return tokens
+
+
+def _is_name(token: Token | None) -> bool:
+    return token is not None and (
+        token.kind == "ident" or (token.kind == "word" and token.value not in KEYWORDS)
+    )
+
+
+def _is_op(token: Token | None, value: str) -> bool:
+    return token is not None and token.kind == "op" and token.value == value
+
+
+def _opens_cte_body(tokens: list[Token], i: int) -> bool:
+    """Whether tokens[i] is the "(" of AS [[NOT] MATERIALIZED] ( in a WITH clause."""
+    if i < 1 or not _is_op(tokens[i], "("):
+        return False
+    before = tokens[i - 1]
+    return before.kind == "word" and before.value in ("as", "materialized")
+
+
+def _statements(tokens: list[Token]) -> list[list[Token]]:
+    """Split on top-level semicolons, dropping empty statements."""
+    statements: list[list[Token]] = [[]]
+    for token in tokens:
+        if _is_op(token, ";"):
+            statements.append([])
+        else:
+            statements[-1].append(token)
+    return [statement for statement in statements if statement]
+
+
+def check_read_only(sql: str) -> list[SqlIssue]:
+    """
+    Check that a query can only read.
+
+    Unlike a keyword blocklist, this looks at tokens, so column names such
+    as created_at or updated_at and words inside string literals are fine.
+    """
+    statements = _statements(tokenize(sql))
+    if not statements:
+        return [SqlIssue("not_read_only", "Empty query.")]
+    if len(statements) > 1:
+        return [SqlIssue("multiple_statements", "Only a single statement is allowed.")]
+
+    tokens = statements[0]
+    first = tokens[0]
+    if not (first.kind == "word" and first.value in _READ_ONLY_START) and not _is_op(first, "("):
+        return [SqlIssue("not_read_only", "Only SELECT queries are allowed.")]
+
+    issues = []
+    for i, token in enumerate(tokens):
+        previous = tokens[i - 1] if i else None
+        following = tokens[i + 1] if i + 1 < len(tokens) else None
+        if token.kind == "ident":
+            # "pg_sleep"(1) calls pg_sleep just the same
+            if token.value.lower() in UNSAFE_FUNCTIONS and _is_op(following, "("):
+                issues.append(SqlIssue("not_read_only", f"Function {token.value}() is not allowed."))
+            continue
+        if token.kind != "word":
+            continue
+        # INSERT/UPDATE/DELETE/MERGE at any depth, e.g. WITH x AS (...) DELETE
+        # FROM t, unless used as a name: a CTE (delete AS (...), delete(a) AS
+        # (...)) or column alias (AS update), or in FOR [NO KEY] UPDATE, which
+        # is reported as a row lock below
+        if token.value in _DML_KEYWORDS:
+            if not (
+                _is_op(following, "(")
+                or (following is not None and following.value == "as" and following.kind == "word")
+                or (previous is not None and previous.kind == "word"
+                    and previous.value in ("as", "for", "key"))
+            ):
+                issues.append(SqlIssue(
+                    "not_read_only",
+                    f"{token.value.upper()} is not allowed; queries must be read-only.",
+                ))
+        # Any other write as the body of a CTE: WITH x AS [[NOT] MATERIALIZED]
+        # (DROP ...). After any other "(" it is a name, e.g. COUNT(comment)
+        elif token.value in WRITE_KEYWORDS and _opens_cte_body(tokens, i - 1):
+            issues.append(SqlIssue(
+                "not_read_only", f"{token.value.upper()} is not allowed; queries must be read-only."
+            ))
+        elif token.value == "into" and previous is not None and previous.value not in _DML_KEYWORDS:
+            issues.append(SqlIssue("not_read_only", "SELECT INTO is not allowed."))
+        elif token.value == "for" and following is not None and following.value in (
+            "update", "share", "no", "key"
+        ):
+            issues.append(SqlIssue("not_read_only", "Row locks (FOR UPDATE/SHARE) are not allowed."))
+        elif token.value in UNSAFE_FUNCTIONS and _is_op(following, "("):
+            issues.append(SqlIssue("not_read_only", f"Function {token.value}() is not allowed."))
+    return issues
+
+
+@dataclass
+class _QueryNames:
+    """What a query's FROM clauses and aliases define."""
+    relations: dict[str, str] = field(default_factory=dict)  # alias or name -> table
+    defined: set[str] = field(default_factory=set)  # column aliases, CTE and derived names
+    opaque: bool = False  # some source has columns we can't know
+    unknown_tables: list[str] = field(default_factory=list)
+
+
+class SqlValidator:
+    """
+    Validates SQL against the tables of one schema snapshot.
+
+    Usage:
+        validator = SqlValidator(snapshot.tables)
+        issues = validator.validate("SELECT nme FROM customers")
+        # [SqlIssue(code="unknown_column", ..., suggestions=["name"])]
+    """
+
+    def __init__(self, tables: list[TableInfo], version: str | None = None) -> None:
+        """
+        Args:
+            tables: Tables (and views) of the schema
+            version: Schema version the tables belong to
+        """
+        self.version = version
+        self._columns: dict[str, set[str]] = {
+            table.name: {column.name for column in table.columns} for table in tables
+        }
+
+    def validate(self, sql: str) -> list[SqlIssue]:
+        """Return the problems found in `sql` (empty if none)."""
+        issues = check_read_only(sql)
+        if issues:
+            return issues
+
+        tokens = _statements(tokenize(sql))[0]
+        names = self._collect_names(tokens)
+        for table in names.unknown_tables:
+            issues.append(SqlIssue(
+                "unknown_table",
+                f"Table '{table}' does not exist.",
+                table=table,
+                suggestions=difflib.get_close_matches(table, self._columns, n=3),
+            ))
+        issues.extend(self._check_columns(tokens, names))
+        return issues
+
+    def _collect_names(self, tokens: list[Token]) -> _QueryNames:
+        """First pass: FROM/JOIN sources, their aliases, and defined names."""
+        names = _QueryNames()
+        # For each open paren: is it a function call's argument list?
+        parens: list[bool] = []
+        from_depth: int | None = None  # depth of the FROM list being read
+        expect_relation = False
+        in_with = bool(tokens) and tokens[0].value == "with"  # reading CTE definitions
+
+        for i, token in enumerate(tokens):
+            previous = tokens[i - 1] if i else None
+            following = tokens[i + 1] if i + 1 < len(tokens) else None
+
+            if _is_op(token, "("):
+                parens.append(_is_name(previous) and not expect_relation)
+                if expect_relation:
+                    names.opaque = True  # derived table
+                    expect_relation = False
+                continue
+            if _is_op(token, ")"):
+                if parens:
+                    parens.pop()
+                if from_depth is not None and len(parens) < from_depth:
+                    from_depth = None
+                continue
+            if _is_op(token, ",") and from_depth == len(parens):
+                expect_relation = True
+                continue
+
+            in_function = bool(parens) and parens[-1]
+            if token.kind == "word" and token.value in ("from", "join") and not in_function \
+                    and not (previous is not None and previous.value == "distinct"):
+                from_depth = len(parens)
+                expect_relation = True
+                continue
+            if token.kind == "word" and token.value in _FROM_END and from_depth == len(parens):
+                from_depth = None
+            if token.kind == "word" and token.value in ("lateral", "only"):
+                continue
+
+            # WITH name [(columns)] AS (...), name AS (...) SELECT ...
+            if in_with and not parens:
+                if token.kind == "word" and token.value == "select":
+                    in_with = False
+                elif _is_name(token) and (
+                    _is_op(following, "(") or (following is not None and following.value == "as")
+                ):
+                    names.defined.add(token.value)
+                    continue
+
+            if expect_relation and _is_name(token):
+                expect_relation = False
+                self._add_relation(tokens, i, names)
+                continue
+            expect_relation = False
+
+            # Column/derived-table aliases: "AS name" or a name right after an
+            # expression ("COUNT(*) n", "customers c", "(SELECT ...) t")
+            if _is_name(token) and previous is not None and (
+                (previous.kind == "word" and previous.value in ("as", "end"))
+                or _is_op(previous, ")")
+                or previous.kind in ("number", "string", "ident")
+                or _is_name(previous)
+            ) and not _is_op(following, "(") and not _is_op(following, "."):
+                names.defined.add(token.value)
+        return names
+
+    def _add_relation(self, tokens: list[Token], i: int, names: _QueryNames) -> None:
+        """Record the FROM/JOIN source starting at tokens[i]."""
+        token = tokens[i]
+        name = token.value
+        end = i
+        if _is_op(tokens[i + 1] if i + 1 < len(tokens) else None, ".") and i + 2 < len(tokens):
+            schema, name, end = name, tokens[i + 2].value, i + 2
+            if schema != "public":
+                names.opaque = True
+                if schema not in _OTHER_SCHEMAS:
+                    names.unknown_tables.append(f"{schema}.{name}")
+                return
+
+        following = tokens[end + 1] if end + 1 < len(tokens) else None
+        if _is_op(following, "("):
+            names.opaque = True  # set-returning function, e.g. generate_series()
+            return
+        if name in names.defined:
+            names.opaque = True  # CTE
+            return
+        if name not in self._columns:
+            names.opaque = True
+            if not name.startswith("pg_"):  # system views are on the search path
+                names.unknown_tables.append(name)
+            return
+
+        names.relations[name] = name
+        alias_at = end + 1
+        if following is not None and following.kind == "word" and following.value == "as":
+            alias_at += 1
+        alias = tokens[alias_at] if alias_at < len(tokens) else None
+        if _is_name(alias) and not (alias.kind == "word" and alias.value in _FROM_END):
+            names.relations[alias.value] = name
+
+    def _check_columns(self, tokens: list[Token], names: _QueryNames) -> list[SqlIssue]:
+        """Second pass: alias.column pairs and unqualified column names."""
+        issues: list[SqlIssue] = []
+        seen: set[tuple[str | None, str]] = set()
+        tables = set(names.relations.values())
+        known = set().union(*(self._columns[table] for table in tables)) if tables else set()
+        aliases = set(names.relations) | names.defined | set(self._columns)
+
+        for i, token in enumerate(tokens):
+            if not _is_name(token):
+                continue
+            previous = tokens[i - 1] if i else None
+            following = tokens[i + 1] if i + 1 < len(tokens) else None
+
+            # qualifier.column
+            if _is_op(following, ".") and i + 2 < len(tokens):
+                column = tokens[i + 2]
+                if _is_op(previous, "."):
+                    continue  # schema.table.column
+                if token.value in names.relations:
+                    table = names.relations[token.value]
+                    if column.kind in ("word", "ident") and column.value not in self._columns[table] \
+                            and (token.value, column.value) not in seen:
+                        seen.add((token.value, column.value))
+                        issues.append(SqlIssue(
+                            "unknown_column",
+                            f"Column '{column.value}' does not exist in table '{table}'.",
+                            table=table,
+                            column=column.value,
+                            suggestions=difflib.get_close_matches(
+                                column.value, self._columns[table], n=3
+                            ),
+                        ))
+                elif token.value not in aliases and token.value not in _OTHER_SCHEMAS \
+                        and token.value != "public" and not names.opaque \
+                        and (None, token.value) not in seen:
+                    seen.add((None, token.value))
+                    issues.append(SqlIssue(
+                        "unknown_alias",
+                        f"'{token.value}' is not a table or alias in the FROM clause.",
+                        suggestions=difflib.get_close_matches(token.value, names.relations, n=3),
+                    ))
+                continue
+
+            # Unqualified: only when every source's columns are known
+            if names.opaque or not tables or _is_op(previous, ".") or _is_op(previous, "::"):
+                continue
+            if _is_op(following, "(") or following is not None and following.kind == "string":
+                continue  # function call, or typed literal such as DATE '2024-01-01'
+            if token.value in known or token.value in aliases or (None, token.value) in seen:
+                continue
+            seen.add((None, token.value))
+            issues.append(SqlIssue(
+                "unknown_column",
+                f"Column '{token.value}' does not exist in "
+                f"{', '.join(sorted(tables))}.",
+                column=token.value,
+                suggestions=difflib.get_close_matches(token.value, known, n=3),
+            ))
+        return issues
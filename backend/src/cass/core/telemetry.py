@@ -0,0 +1,343 @@
+"""
+Telemetry for CASS
+==================
+Per-stage timing for the chat pipeline (schema selection, LLM first token
+and generation, SQL extraction and validation, database execution, retry,
+serialization), plus token and row counts and SSE frames per stream.
+
+- Metrics are kept in-process and rendered in the Prometheus text format
+  (GET /metrics); no client library needed
+- Spans are also sent to OpenTelemetry when enabled and opentelemetry-api is
+  installed (an SDK/exporter configured by the deployment does the rest)
+- The stages of the current request are collected so /chat can return them
+  in a Server-Timing header
+
+While disabled, span() hands out a shared no-op object, so instrumented code
+costs one attribute check per stage.
+
+Usage:
+    with telemetry.span("llm") as span:
+        response = await llm.chat(messages)
+        span.set("tokens", response.tokens_used)
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator
+
+try:
+    from opentelemetry import trace as otel_trace
+    OTEL_AVAILABLE = True
+except ImportError:
+    otel_trace = None
+    OTEL_AVAILABLE = False
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; LLM stages take seconds, cached database hits take microseconds
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+# Frames per streamed response
+FRAME_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing value per label combination."""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, labels: tuple[str, ...] = ()) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels: tuple[str, ...] = ()) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label combination."""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [count per bucket (non-cumulative, last is +Inf), sum, count]
+        self._series: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, labels: tuple[str, ...] = ()) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+
+    def count(self, labels: tuple[str, ...] = ()) -> int:
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket
+                le = f'le="{_number(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total!r}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+def render_gauges(prefix: str, stats: dict[str, dict[str, Any]]) -> list[str]:
+    """
+    Render /stats-style sections as Prometheus gauges.
+
+    Numbers become `<prefix>_<section>_<key>`. A dict whose values are all
+    dicts (e.g. one entry per backend) adds a `name` label. Strings are skipped.
+    """
+    samples: dict[str, list[str]] = {}
+
+    def walk(name: str, value: Any, label: str | None) -> None:
+        if isinstance(value, dict):
+            if value and all(isinstance(item, dict) for item in value.values()):
+                for key, item in value.items():
+                    walk(name, item, key)
+            else:
+                for key, item in value.items():
+                    walk(f"{name}_{key}", item, label)
+        elif isinstance(value, (int, float)):
+            labels = "" if label is None else f'{{name="{_escape(label)}"}}'
+            samples.setdefault(name, []).append(f"{name}{labels} {_number(value)}")
+
+    for section, values in stats.items():
+        walk(f"{prefix}_{section}", values, None)
+
+    lines = []
+    for name, values in samples.items():
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(values)
+    return lines
+
+
+class RequestTrace:
+    """Stage durations (ms) of one request, summed per stage."""
+
+    def __init__(self) -> None:
+        self.stages: dict[str, float] = {}
+
+    def add(self, stage: str, ms: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + ms
+
+    def server_timing(self) -> str:
+        """The stages as a Server-Timing header value."""
+        return ", ".join(f"{stage};dur={ms:.1f}" for stage, ms in self.stages.items())
+
+
+_current_trace: ContextVar[RequestTrace | None] = ContextVar("cass_request_trace", default=None)
+
+
+class _NoopSpan:
+    """Returned by span() while telemetry is off."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """Times one stage; reports to the histogram, the request trace and OTel."""
+
+    __slots__ = ("_telemetry", "stage", "attributes", "_started", "_otel_cm", "_otel_span")
+
+    def __init__(self, telemetry: "Telemetry", stage: str, attributes: dict[str, Any]) -> None:
+        self._telemetry = telemetry
+        self.stage = stage
+        self.attributes = attributes
+        self._otel_cm = None
+        self._otel_span = None
+
+    def set(self, key: str, value: Any) -> None:
+        """Attach an attribute (e.g. tokens or rows) to the span."""
+        self.attributes[key] = value
+        if self._otel_span is not None:
+            self._otel_span.set_attribute(f"cass.{key}", value)
+
+    def __enter__(self) -> "Span":
+        tracer = self._telemetry._otel_tracer
+        if tracer is not None:
+            self._otel_cm = tracer.start_as_current_span(
+                f"cass.{self.stage}",
+                attributes={f"cass.{key}": value for key, value in self.attributes.items()},
+            )
+            self._otel_span = self._otel_cm.__enter__()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        elapsed = time.perf_counter() - self._started
+        self._telemetry.observe(self.stage, elapsed)
+        if self._otel_cm is not None:
+            self._otel_cm.__exit__(exc_type, exc, tb)
+
+
+class Telemetry:
+    """Process-wide metrics and (optionally) OpenTelemetry tracing."""
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self._otel_tracer = None
+        self.stage_seconds = Histogram(
+            "cass_stage_duration_seconds",
+            "Time spent in each stage of the chat pipeline.",
+            ("stage",),
+        )
+        self.request_seconds = Histogram(
+            "cass_http_request_duration_seconds",
+            "HTTP request latency by route.",
+            ("method", "route", "status"),
+        )
+        self.llm_tokens = Counter(
+            "cass_llm_tokens_total",
+            "Tokens processed by the LLM (prompt or completion).",
+            ("model", "kind"),
+        )
+        self.pool_wait_seconds = Histogram(
+            "cass_db_pool_acquire_seconds",
+            "Time spent waiting for a pooled database connection.",
+            ("pool",),
+        )
+        self.sse_frames = Histogram(
+            "cass_sse_frames_per_stream",
+            "SSE frames sent per streamed response.",
+            ("route",),
+            buckets=FRAME_BUCKETS,
+        )
+        self.db_rows = Counter(
+            "cass_db_rows_total",
+            "Rows returned by database queries.",
+            ("source",),
+        )
+
+    def configure(self, enabled: bool = True, otel: bool = False) -> None:
+        """
+        Args:
+            enabled: Record stage timings and counters
+            otel: Also emit OpenTelemetry spans (needs opentelemetry-api)
+        """
+        self.enabled = enabled
+        self._otel_tracer = None
+        if enabled and otel and OTEL_AVAILABLE:
+            self._otel_tracer = otel_trace.get_tracer("cass")
+
+    def span(self, stage: str, **attributes: Any) -> Span | _NoopSpan:
+        """Time a stage (use as a context manager)."""
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, stage, attributes)
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Record a stage duration measured elsewhere (e.g. reported by Ollama)."""
+        if not self.enabled:
+            return
+        self.stage_seconds.observe(seconds, (stage,))
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(stage, seconds * 1000)
+
+    def count_tokens(self, model: str, prompt: int = 0, completion: int = 0) -> None:
+        if not self.enabled:
+            return
+        if prompt:
+            self.llm_tokens.inc(prompt, (model, "prompt"))
+        if completion:
+            self.llm_tokens.inc(completion, (model, "completion"))
+
+    def count_rows(self, rows: int, source: str = "database") -> None:
+        if self.enabled:
+            self.db_rows.inc(rows, (source,))
+
+    def count_frames(self, frames: int, route: str) -> None:
+        if self.enabled:
+            self.sse_frames.observe(frames, (route,))
+
+    @contextmanager
+    def request_trace(self) -> Iterator[RequestTrace | None]:
+        """Collect the stages run inside the block (None while disabled)."""
+        if not self.enabled:
+            yield None
+            return
+        trace = RequestTrace()
+        token = _current_trace.set(trace)
+        try:
+            yield trace
+        finally:
+            _current_trace.reset(token)
+
+    def render(self) -> list[str]:
+        """The metrics in the Prometheus text format (one line per item)."""
+        lines: list[str] = []
+        metrics = (
+            self.stage_seconds, self.request_seconds, self.pool_wait_seconds,
+            self.sse_frames, self.llm_tokens, self.db_rows,
+        )
+        for metric in metrics:
+            lines.extend(metric.render())
+        return lines
+
+
+# Configured from settings at startup (see server/app.py)
+telemetry = Telemetry()
@@ -0,0 +1,65 @@
+"""
+Tests for the read-only check that guards /sql and generated SQL
+Run (from backend/): PYTHONPATH=src python -m pytest src/cass/core/test_sql_validator.py
+"""
+
+from cass.core.sql_validator import check_read_only
+
+WRITES = [
+    "WITH x AS (SELECT 1) DELETE FROM orders",
+    "WITH x AS (SELECT 1) DELETE FROM orders RETURNING *",
+    "WITH x AS (SELECT 1) UPDATE orders SET status = 'x'",
+    "WITH x AS (SELECT 1) INSERT INTO orders (id) SELECT 1",
+    "WITH x AS (SELECT 1) MERGE INTO orders o USING x ON true WHEN MATCHED THEN DELETE",
+    "WITH d AS (DELETE FROM orders RETURNING *) SELECT count(*) FROM d",
+    "WITH d AS MATERIALIZED (UPDATE orders SET status = 'x' RETURNING id) SELECT * FROM d",
+    "WITH a AS (SELECT 1), b AS (WITH c AS (SELECT 1) DELETE FROM orders RETURNING id) SELECT * FROM b",
+    "SELECT * FROM orders FOR UPDATE",
+    "SELECT * INTO copy FROM orders",
+]
+
+UNSAFE_CALLS = [
+    'SELECT "pg_sleep"(100)',
+    "SELECT \"nextval\"('orders_id_seq')",
+    "SELECT pg_catalog.pg_sleep(100)",
+    "SELECT pg_notify('table_changed', 'orders')",
+    "SELECT lo_from_bytea(0, 'x')",
+    "SELECT pg_try_advisory_lock(1)",
+]
+
+READS = [
+    "SELECT COUNT(comment) FROM orders",
+    "SELECT created_at, updated_at, deleted FROM orders",
+    "SELECT 'delete from orders; update orders' AS note",
+    "WITH recent AS (SELECT * FROM orders) SELECT count(*) FROM recent",
+    "SELECT status AS update FROM orders",
+    'SELECT "name"(x) FROM orders',
+]
+
+
+def test_writes_are_rejected():
+    for sql in WRITES:
+        assert any(issue.code == "not_read_only" for issue in check_read_only(sql)), sql
+
+
+def test_unsafe_functions_are_rejected():
+    for sql in UNSAFE_CALLS:
+        assert any(issue.code == "not_read_only" for issue in check_read_only(sql)), sql
+
+
+def test_reads_are_allowed():
+    for sql in READS:
+        assert check_read_only(sql) == [], sql
+
+
+def test_single_statement_only():
+    issues = check_read_only("SELECT 1; DELETE FROM orders")
+    assert [issue.code for issue in issues] == ["multiple_statements"]
+
+
+if __name__ == "__main__":
+    test_writes_are_rejected()
+    test_unsafe_functions_are_rejected()
+    test_reads_are_allowed()
+    test_single_statement_only()
+    print("✅ All tests passed!")
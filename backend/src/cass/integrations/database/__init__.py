@@ -2,6 +2,17 @@
 Database integrations for CASS.
 """
 
+from .pool import PoolSettings
 from .postgres import PostgresRunner
+from .result_cache import QueryResultCache
+from .results import ColumnarResult
+from .schema_cache import SchemaCache, SchemaSnapshot
 
-__all__ = ["PostgresRunner"]
+__all__ = [
+    "ColumnarResult",
+    "PoolSettings",
+    "PostgresRunner",
+    "QueryResultCache",
+    "SchemaCache",
+    "SchemaSnapshot",
+]
@@ -0,0 +1,264 @@
+"""
+Connection Pools for CASS
+=========================
+Pool settings, saturation counters, and routing of read queries to
+replicas.
+
+- PoolSettings: what asyncpg.create_pool() is called with (sizes, command
+  and statement timeouts, idle connection lifetime, session settings)
+- MonitoredPool: wraps an asyncpg pool and records how long each acquire
+  waited for a free connection and how many connections are in use
+- ReplicaSet: read replicas behind health checks. Each read goes to the
+  healthy replica with the fewest connections in use; a replica that fails
+  a check, or lags too far behind, is skipped until it passes again. With
+  no healthy replica, reads go to the primary.
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+import asyncpg
+
+from cass.core.telemetry import telemetry
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean the server (not the query) is the problem
+CONNECTION_ERRORS = (OSError, asyncpg.InterfaceError, asyncpg.PostgresConnectionError)
+
+# Replay lag in seconds; 0 when everything received has been replayed (an
+# idle primary would otherwise look further behind the longer it is idle),
+# NULL on a server that is not a replica
+REPLICA_LAG_QUERY = """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+
+@dataclass
+class PoolSettings:
+    """Arguments for asyncpg.create_pool(), plus settings for each connection."""
+    min_size: int = 1
+    max_size: int = 10
+    command_timeout: float | None = 60.0  # client side, per query
+    statement_timeout_ms: int = 0  # server side (0 = none)
+    max_inactive_connection_lifetime: float = 300.0
+    application_name: str = "cass"
+    # Session settings for every connection, e.g. {"work_mem": "64MB"}. They
+    # are sent at connect time, so they survive the RESET ALL that asyncpg
+    # runs when a connection goes back to the pool (a SET would not)
+    server_settings: dict[str, str] = field(default_factory=dict)
+
+    def pool_kwargs(self) -> dict[str, Any]:
+        server_settings = {"application_name": self.application_name, **self.server_settings}
+        if self.statement_timeout_ms:
+            server_settings["statement_timeout"] = str(self.statement_timeout_ms)
+        return {
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "command_timeout": self.command_timeout,
+            "max_inactive_connection_lifetime": self.max_inactive_connection_lifetime,
+            "server_settings": server_settings,
+        }
+
+
+@dataclass
+class PoolStats:
+    """Acquire counters for one pool."""
+    acquires: int = 0
+    waits: int = 0  # acquires that found no idle connection
+    wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+    timeouts: int = 0
+    in_use: int = 0
+    max_in_use: int = 0
+
+    def as_dict(self) -> dict[str, float]:
+        return asdict(self)
+
+
+# Acquires that took longer than this had to wait for a connection
+_WAIT_THRESHOLD = 0.001
+
+
+class MonitoredPool:
+    """An asyncpg pool that counts acquire waits and connections in use."""
+
+    def __init__(self, name: str, pool: asyncpg.Pool) -> None:
+        self.name = name
+        self.pool = pool
+        self.stats = PoolStats()
+
+    @asynccontextmanager
+    async def acquire(self, timeout: float | None = None) -> AsyncIterator[asyncpg.Connection]:
+        """Borrow a connection (use as `async with pool.acquire() as conn`)."""
+        started = time.perf_counter()
+        try:
+            conn = await self.pool.acquire(timeout=timeout)
+        except asyncio.TimeoutError:
+            self.stats.timeouts += 1
+            raise
+        waited = time.perf_counter() - started
+        stats = self.stats
+        stats.acquires += 1
+        stats.wait_seconds += waited
+        if waited > _WAIT_THRESHOLD:
+            stats.waits += 1
+            stats.max_wait_seconds = max(stats.max_wait_seconds, waited)
+        stats.in_use += 1
+        stats.max_in_use = max(stats.max_in_use, stats.in_use)
+        if telemetry.enabled:
+            telemetry.pool_wait_seconds.observe(waited, (self.name,))
+        try:
+            yield conn
+        finally:
+            stats.in_use -= 1
+            await self.pool.release(conn)
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            **self.stats.as_dict(),
+            "size": self.pool.get_size(),
+            "idle": self.pool.get_idle_size(),
+            "max_size": self.pool.get_max_size(),
+        }
+
+    async def close(self) -> None:
+        await self.pool.close()
+
+
+@dataclass
+class Replica:
+    """A read replica and what the health checks last found."""
+    name: str
+    pool: MonitoredPool
+    healthy: bool = False  # until the first check passes
+    lag_seconds: float | None = None
+    failures: int = 0  # failed checks or queries since the last good check
+    checked_at: float | None = None
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            **self.pool.as_dict(),
+            "healthy": int(self.healthy),
+            "lag_seconds": self.lag_seconds if self.lag_seconds is not None else 0.0,
+            "failures": self.failures,
+        }
+
+
+class ReplicaSet:
+    """
+    Picks a replica for each read and health-checks them in the background.
+
+    Usage:
+        replicas = ReplicaSet(pools, max_lag=30, check_interval=5)
+        await replicas.start()
+        pool = replicas.choose() or primary
+    """
+
+    def __init__(
+        self,
+        pools: list[MonitoredPool],
+        max_lag: float | None = 30.0,
+        check_interval: float = 5.0,
+        check_timeout: float = 2.0,
+    ) -> None:
+        """
+        Args:
+            pools: One pool per replica
+            max_lag: Skip replicas further behind than this (seconds; None = any)
+            check_interval: Seconds between health checks
+            check_timeout: Seconds a check may take before the replica counts as down
+        """
+        self.replicas = [Replica(name=pool.name, pool=pool) for pool in pools]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self.fallbacks = 0  # reads sent to the primary for lack of a healthy replica
+        self._turn = itertools.count()
+        self._checker: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        """Check every replica once, then keep checking in the background."""
+        if self._checker is None:
+            await self._check_all()
+            self._checker = asyncio.create_task(self._check_forever())
+
+    def choose(self) -> MonitoredPool | None:
+        """The healthy replica with the fewest connections in use (None if none is healthy)."""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            self.fallbacks += 1
+            return None
+        # Rotate the starting point so equally busy replicas take turns
+        start = next(self._turn) % len(healthy)
+        rotated = healthy[start:] + healthy[:start]
+        return min(rotated, key=lambda replica: replica.pool.stats.in_use).pool
+
+    def report_failure(self, pool: MonitoredPool, error: BaseException) -> None:
+        """A query on this replica failed at the connection level; skip it until the next good check."""
+        for replica in self.replicas:
+            if replica.pool is pool:
+                if replica.healthy:
+                    logger.warning("Replica %s marked down: %r", replica.name, error)
+                replica.healthy = False
+                replica.failures += 1
+
+    async def check(self, replica: Replica) -> None:
+        """Run one health check and update the replica's state."""
+        try:
+            async with replica.pool.acquire(timeout=self.check_timeout) as conn:
+                lag = await conn.fetchval(REPLICA_LAG_QUERY, timeout=self.check_timeout)
+        except (*CONNECTION_ERRORS, asyncio.TimeoutError, asyncpg.PostgresError) as e:
+            if replica.healthy:
+                logger.warning("Replica %s failed its health check: %r", replica.name, e)
+            replica.healthy = False
+            replica.failures += 1
+        else:
+            replica.lag_seconds = float(lag) if lag is not None else 0.0
+            healthy = self.max_lag is None or replica.lag_seconds <= self.max_lag
+            if healthy != replica.healthy:
+                logger.info(
+                    "Replica %s is %s (lag %.1fs)",
+                    replica.name, "back" if healthy else "lagging", replica.lag_seconds,
+                )
+            replica.healthy = healthy
+            if healthy:
+                replica.failures = 0
+        replica.checked_at = time.time()
+
+    async def _check_all(self) -> None:
+        await asyncio.gather(*(self.check(replica) for replica in self.replicas))
+
+    async def _check_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self._check_all()
+
+    def as_dict(self) -> dict[str, dict[str, Any]]:
+        return {replica.name: replica.as_dict() for replica in self.replicas}
+
+    async def close(self) -> None:
+        if self._checker is not None:
+            self._checker.cancel()
+            self._checker = None
+        await asyncio.gather(*(replica.pool.close() for replica in self.replicas))
+
+
+async def create_pool(
+    name: str,
+    dsn: str,
+    settings: PoolSettings,
+    init: Callable[[asyncpg.Connection], Awaitable[None]] | None = None,
+    **kwargs: Any,
+) -> MonitoredPool:
+    """Create a monitored asyncpg pool; kwargs go to asyncpg.create_pool()."""
+    pool = await asyncpg.create_pool(dsn=dsn, init=init, **settings.pool_kwargs(), **kwargs)
+    return MonitoredPool(name, pool)
@@ -0,0 +1,412 @@
+"""
+Query Result Cache for CASS
+===========================
+Caches the rows of read-only queries, keyed on normalized SQL text.
+
+Entries remember the change counters of every table they read (from
+pg_stat_user_tables, polled by PostgresRunner, or bumped by NOTIFY
+triggers); an entry is only served while those counters are unchanged.
+Eviction is LRU, bounded by entry count and approximate bytes, with a
+per-entry TTL as a backstop.
+
+With a shared backend (see cass.core.shared_cache), results are also
+written there, and a worker missing a query looks there before running it.
+A shared entry carries the table counters it was read at. Every worker
+polls the same counters, so each worker can check an entry against its own
+view of them, as it does for local entries.
+"""
+
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+from cass.core.shared_cache import CacheBackend, pack, unpack
+
+# Quoted strings/identifiers, comments, numbers, words, or any other character
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<string>'(?:[^']|'')*')
+    | (?P<ident>"(?:[^"]|"")*")
+    | (?P<comment>--[^\n]*|/\*.*?\*/)
+    | (?P<number>\b\d+(?:\.\d*)?(?:e[+-]?\d+)?\b)
+    | (?P<word>[a-zA-Z_][a-zA-Z0-9_$]*)
+    | (?P<space>\s+)
+    | (?P<other>.)
+    """,
+    re.VERBOSE | re.DOTALL | re.IGNORECASE,
+)
+
+# Results of queries using these can change without any table changing
+_VOLATILE = frozenset({
+    "now", "random", "current_date", "current_time", "current_timestamp",
+    "localtime", "localtimestamp", "clock_timestamp", "statement_timestamp",
+    "transaction_timestamp", "timeofday", "nextval", "currval", "setval",
+    "gen_random_uuid", "uuid_generate_v4", "pg_sleep", "txid_current",
+    "current_user", "session_user", "user", "inet_client_addr",
+})
+
+_READ_ONLY_START = frozenset({"select", "with", "table", "values"})
+# Data-modifying statements, possibly inside a WITH query
+_WRITES = frozenset({"insert", "update", "delete", "merge"})
+_LOCKING = re.compile(r"\bfor\s+(?:update|share|no\s+key\s+update|key\s+share)\b")
+
+
+def _canonical_number(text: str) -> str:
+    """1.50 -> 1.5, 007 -> 7 (so equivalent literals share a cache key)."""
+    lowered = text.lower()
+    if "e" in lowered:
+        return lowered
+    if "." in lowered:
+        whole, _, frac = lowered.partition(".")
+        whole = whole.lstrip("0") or "0"
+        frac = frac.rstrip("0")
+        return f"{whole}.{frac}" if frac else whole
+    return lowered.lstrip("0") or "0"
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Normalize SQL text for use as a cache key.
+
+    Comments are dropped, whitespace is collapsed, keywords and unquoted
+    identifiers are lowercased (Postgres folds them anyway), numeric
+    literals are canonicalized and trailing semicolons removed. String
+    literals and quoted identifiers are kept exactly.
+    """
+    parts: list[str] = []
+    pending_space = False
+    for match in _TOKEN_RE.finditer(sql):
+        kind = match.lastgroup
+        text = match.group()
+        if kind in ("comment", "space"):
+            pending_space = bool(parts)
+            continue
+        if kind == "word":
+            text = text.lower()
+        elif kind == "number":
+            text = _canonical_number(text)
+        # Spacing around ( ) , is insignificant
+        if pending_space and text not in "(),;" and parts[-1] not in ("(", ","):
+            parts.append(" ")
+        pending_space = False
+        parts.append(text)
+    while parts and parts[-1] == ";":
+        parts.pop()
+    return "".join(parts)
+
+
+def _words(normalized: str) -> set[str]:
+    """Keywords and identifiers (quoted ones unquoted), skipping literals."""
+    words = set()
+    for match in _TOKEN_RE.finditer(normalized):
+        if match.lastgroup == "word":
+            words.add(match.group())
+        elif match.lastgroup == "ident":
+            words.add(match.group()[1:-1].replace('""', '"'))
+    return words
+
+
+def is_cacheable(normalized: str) -> bool:
+    """Only plain reads whose result depends on table contents alone."""
+    first = normalized.split(" ", 1)[0].lstrip("(")
+    if first not in _READ_ONLY_START:
+        return False
+    if _LOCKING.search(normalized):
+        return False
+    words = _words(normalized)
+    # WITH x AS (...) DELETE ... or WITH d AS (DELETE ...) SELECT: writes
+    # that must run every time
+    return not (words & _VOLATILE or words & _WRITES)
+
+
+@dataclass
+class CachedResult:
+    """Rows of one query, plus the table versions they were read at."""
+    rows: list[dict[str, Any]]
+    created_at: float
+    size: int
+    tables: dict[str, str] = field(default_factory=dict)
+    depends_on_all: bool = False
+    global_version: int = 0
+
+
+@dataclass
+class ResultCacheStats:
+    """Counters describing how the result cache is being used."""
+    hits: int = 0
+    shared_hits: int = 0  # served from the shared backend
+    misses: int = 0
+    stores: int = 0
+    shared_stores: int = 0
+    uncacheable: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.shared_hits + self.misses
+        return (self.hits + self.shared_hits) / lookups if lookups else 0.0
+
+    def as_dict(self) -> dict[str, float]:
+        return {**asdict(self), "hit_rate": self.hit_rate}
+
+
+def _estimate_size(rows: list[dict[str, Any]]) -> int:
+    """Approximate memory held by a result (cheap, not exact)."""
+    size = 64
+    for row in rows:
+        size += 64
+        for value in row.values():
+            size += len(value) + 48 if isinstance(value, (str, bytes)) else 32
+    return size
+
+
+class QueryResultCache:
+    """
+    LRU/TTL cache of query results with table-level invalidation.
+
+    Usage:
+        cache = QueryResultCache(max_entries=500, ttl=60)
+        runner = PostgresRunner(dsn, result_cache=cache)
+        await runner.execute("SELECT COUNT(*) FROM orders")  # miss
+        await runner.execute("select count(*)  from orders;")  # hit
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 500,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl: float = 60.0,
+        poll_interval: float = 1.0,
+        shared: CacheBackend | None = None,
+    ) -> None:
+        """
+        Args:
+            max_entries: Maximum number of cached results
+            max_bytes: Approximate memory cap for cached rows
+            ttl: Seconds a result may be served even if nothing changed
+            poll_interval: Seconds between table change counter polls
+            shared: Second tier shared with the other workers (used by
+                fetch() and store())
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self.shared = shared
+        self.stats = ResultCacheStats()
+        self._entries: OrderedDict[str, CachedResult] = OrderedDict()
+        self._bytes = 0
+        # Table name -> change counter; views make a query depend on everything
+        self._table_versions: dict[str, str] = {}
+        # Table name -> NOTIFY count; part of the version, so that a poll
+        # whose statistics lag behind the notification can't undo it
+        self._notified: dict[str, int] = {}
+        self._views: set[str] = set()
+        self._global_version = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def key(self, sql: str, args: tuple = ()) -> str | None:
+        """Cache key for a query, or None if its result must not be cached."""
+        normalized = normalize_sql(sql)
+        if not is_cacheable(normalized):
+            self.stats.uncacheable += 1
+            return None
+        if args:
+            normalized += "\x00" + repr(args)
+        return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> list[dict[str, Any]] | None:
+        """Return cached rows if they are still valid (this process only)."""
+        rows = self._get_local(key)
+        if rows is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return rows
+
+    async def fetch(self, key: str) -> list[dict[str, Any]] | None:
+        """Like get(), but a local miss is looked up in the shared backend."""
+        rows = self._get_local(key)
+        if rows is not None:
+            self.stats.hits += 1
+            return rows
+        if self.shared is not None:
+            rows = await self._get_shared(key)
+            if rows is not None:
+                self.stats.shared_hits += 1
+                return rows
+        self.stats.misses += 1
+        return None
+
+    def _get_local(self, key: str) -> list[dict[str, Any]] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.created_at >= self.ttl:
+            self._remove(key)
+            self.stats.expirations += 1
+            return None
+        if not self._is_current(entry):
+            self._remove(key)
+            self.stats.invalidations += 1
+            return None
+        self._entries.move_to_end(key)
+        # Copies, so a caller changing a row doesn't change the cache
+        return [dict(row) for row in entry.rows]
+
+    async def _get_shared(self, key: str) -> list[dict[str, Any]] | None:
+        """Rows from the shared backend, if still valid here; kept locally too."""
+        assert self.shared is not None
+        if not self._table_versions:
+            return None  # no counters yet to check the entry against
+        data = await self.shared.get(f"result:{key}")
+        value = unpack(data) if data is not None else None
+        if value is None:
+            return None
+        rows, tables, versions_digest, stored_at = value
+        age = time.time() - stored_at
+        if age >= self.ttl:
+            return None
+        if versions_digest is not None:
+            if versions_digest != self._versions_digest():
+                return None
+        elif any(self._table_versions.get(name) != version for name, version in tables.items()):
+            return None
+        self._insert(key, CachedResult(
+            rows=rows,
+            created_at=time.monotonic() - age,
+            size=_estimate_size(rows),
+            tables=tables,
+            depends_on_all=versions_digest is not None,
+            global_version=self._global_version,
+        ))
+        return [dict(row) for row in rows]
+
+    @property
+    def generation(self) -> int:
+        """Changes whenever any table version does; pass it back to put()."""
+        return self._global_version
+
+    def put(
+        self, key: str, sql: str, rows: list[dict[str, Any]], generation: int | None = None
+    ) -> CachedResult | None:
+        """
+        Store rows for a query, recording the versions of tables it reads.
+
+        Args:
+            key: Key from key()
+            sql: The query (used to find the tables it reads)
+            rows: Query results
+            generation: Value of .generation read before the query ran; the
+                rows are dropped if a table changed while it was running
+
+        Returns:
+            The stored entry, or None if the rows were dropped
+        """
+        if generation is not None and generation != self._global_version:
+            return None
+        size = _estimate_size(rows)
+        if size > self.max_bytes:
+            return None
+
+        words = _words(normalize_sql(sql))
+        tables = {
+            name: version
+            for name, version in self._table_versions.items()
+            if name in words
+        }
+        entry = CachedResult(
+            rows=[dict(row) for row in rows],  # the caller keeps `rows`
+            created_at=time.monotonic(),
+            size=size,
+            tables=tables,
+            # Views (and tables we haven't seen counters for yet) could read
+            # anything, so such entries are dropped on any change
+            depends_on_all=not tables or bool(words & self._views),
+            global_version=self._global_version,
+        )
+        self._insert(key, entry)
+        self.stats.stores += 1
+        return entry
+
+    async def store(
+        self, key: str, sql: str, rows: list[dict[str, Any]], generation: int | None = None
+    ) -> None:
+        """put(), then write the entry to the shared backend."""
+        entry = self.put(key, sql, rows, generation)
+        if entry is None or self.shared is None or not self._table_versions:
+            return
+        if entry.size > self.shared.max_value_bytes:
+            return  # not worth pickling only for the backend to refuse it
+        versions_digest = self._versions_digest() if entry.depends_on_all else None
+        data = pack((rows, entry.tables, versions_digest, time.time()))
+        if data is not None:
+            await self.shared.set(f"result:{key}", data, self.ttl)
+            self.stats.shared_stores += 1
+
+    async def clear_shared(self) -> None:
+        """Drop the results of every worker from the shared backend."""
+        if self.shared is not None:
+            await self.shared.clear("result:")
+
+    def _insert(self, key: str, entry: CachedResult) -> None:
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self._bytes += entry.size
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            self._remove(next(iter(self._entries)))
+            self.stats.evictions += 1
+
+    def update_table_versions(self, versions: dict[str, str], views: set[str]) -> None:
+        """Record the latest change counters (from pg_stat_user_tables)."""
+        versions = dict(versions)
+        for table, count in self._notified.items():
+            versions[table] = f"{versions.get(table, '')}+{count}"
+        if versions != self._table_versions:
+            self._global_version += 1
+        self._table_versions = versions
+        self._views = views
+
+    def table_changed(self, table: str) -> None:
+        """Mark a table as modified (e.g. from a NOTIFY trigger)."""
+        count = self._notified.get(table, 0) + 1
+        self._notified[table] = count
+        polled = self._table_versions.get(table, "").rpartition("+")
+        base = polled[0] if polled[1] else polled[2]
+        self._table_versions[table] = f"{base}+{count}"
+        self._global_version += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def _versions_digest(self) -> str:
+        """Digest of every table version, for shared entries that depend on all."""
+        text = repr(sorted(self._table_versions.items()))
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def _is_current(self, entry: CachedResult) -> bool:
+        if entry.depends_on_all:
+            return entry.global_version == self._global_version
+        return all(
+            self._table_versions.get(name) == version
+            for name, version in entry.tables.items()
+        )
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
@@ -0,0 +1,77 @@
+"""
+Columnar Query Results
+======================
+A compact result layout: column names and types once, then one array of
+values per column, instead of a dict (with every column name) per row.
+
+Optionally converts to Apache Arrow IPC when pyarrow is installed.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Sequence
+
+try:
+    import pyarrow as pa
+except ImportError:  # Arrow output is optional
+    pa = None
+
+
+@dataclass
+class ColumnarResult:
+    """Query results stored column by column."""
+    columns: list[str]
+    types: list[str] = field(default_factory=list)
+    data: list[list[Any]] = field(default_factory=list)  # one list per column
+    row_count: int = 0
+
+    @classmethod
+    def from_records(
+        cls, columns: list[str], types: list[str], records: Sequence[Sequence[Any]]
+    ) -> "ColumnarResult":
+        """Build from row tuples (e.g. asyncpg Records) in column order."""
+        if records:
+            data = [list(values) for values in zip(*records)]
+        else:
+            data = [[] for _ in columns]
+        return cls(columns=columns, types=types, data=data, row_count=len(records))
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[dict[str, Any]]) -> "ColumnarResult":
+        """Build from the list-of-dicts layout returned by execute()."""
+        rows = list(rows)
+        columns = list(rows[0].keys()) if rows else []
+        return cls.from_records(columns, [], [tuple(row.values()) for row in rows])
+
+    def to_dict(self) -> dict[str, Any]:
+        """JSON-friendly layout: {"columns", "types", "data", "row_count"}."""
+        return {
+            "columns": self.columns,
+            "types": self.types,
+            "data": self.data,
+            "row_count": self.row_count,
+        }
+
+    def to_rows(self) -> list[dict[str, Any]]:
+        """Back to one dict per row."""
+        return [dict(zip(self.columns, values)) for values in zip(*self.data)]
+
+    def to_arrow_ipc(self) -> bytes:
+        """
+        Serialize as an Arrow IPC stream.
+
+        Raises:
+            RuntimeError: If pyarrow is not installed
+        """
+        if pa is None:
+            raise RuntimeError("Arrow output requires pyarrow (pip install pyarrow)")
+        table = pa.Table.from_arrays(
+            [pa.array(values) for values in self.data], names=self.columns
+        )
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+
+def arrow_available() -> bool:
+    return pa is not None
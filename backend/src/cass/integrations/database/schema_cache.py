@@ -0,0 +1,208 @@
+"""
+Schema Cache for CASS
+=====================
+Keeps the formatted database schema in memory so chat requests don't pay a
+catalog round trip (and the string building) on every call.
+
+The cache serves fresh snapshots directly, serves stale snapshots while a
+background refresh runs, and funnels concurrent misses into a single
+in-flight refresh.
+
+With a shared backend (see cass.core.shared_cache), a refresh first takes
+the snapshot another worker stored there, while it is younger than the
+TTL, and only reads the catalog when there is none. Invalidations and
+forced refreshes always read the catalog and overwrite the shared copy.
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Awaitable, Callable
+
+from cass.core.schema import TableInfo, render_schema
+from cass.core.shared_cache import CacheBackend, pack, unpack
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SchemaSnapshot:
+    """A formatted schema together with its version key and table metadata."""
+    text: str
+    version: str
+    loaded_at: float
+    tables: list[TableInfo] = field(default_factory=list)
+
+
+@dataclass
+class SchemaCacheStats:
+    """Counters describing how the schema cache is being used."""
+    hits: int = 0
+    stale_hits: int = 0
+    misses: int = 0
+    shared_loads: int = 0  # refreshes served by the shared backend
+    refreshes: int = 0
+    refresh_errors: int = 0
+    invalidations: int = 0
+    last_refresh_ms: float = 0.0
+    total_refresh_ms: float = 0.0
+
+    def as_dict(self) -> dict[str, float]:
+        return asdict(self)
+
+
+def schema_version(text: str) -> str:
+    """Return a short, stable version key for a formatted schema."""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+
+class SchemaCache:
+    """
+    TTL cache with single-flight refresh for the schema snapshot.
+
+    Usage:
+        cache = SchemaCache(loader=runner._load_tables, ttl=300)
+        snapshot = await cache.get()
+        print(snapshot.version, snapshot.text)
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], Awaitable[list[TableInfo]]],
+        ttl: float = 300.0,
+        shared: CacheBackend | None = None,
+    ) -> None:
+        """
+        Args:
+            loader: Coroutine function that loads the table metadata
+            ttl: Seconds a snapshot is considered fresh
+            shared: Second tier shared with the other workers
+        """
+        self._loader = loader
+        self.ttl = ttl
+        self.shared = shared
+        self.stats = SchemaCacheStats()
+        self._snapshot: SchemaSnapshot | None = None
+        self._inflight: asyncio.Task[SchemaSnapshot] | None = None
+        self._generation = 0
+
+    @property
+    def snapshot(self) -> SchemaSnapshot | None:
+        """The current snapshot, fresh or not (None until first load)."""
+        return self._snapshot
+
+    async def get(self) -> SchemaSnapshot:
+        """
+        Return the current schema snapshot.
+
+        Fresh snapshots are returned as-is. Expired snapshots are still
+        returned, but trigger a background refresh. Without any snapshot,
+        callers wait on the shared in-flight refresh.
+        """
+        snapshot = self._snapshot
+        if snapshot is not None:
+            if time.monotonic() - snapshot.loaded_at < self.ttl:
+                self.stats.hits += 1
+            else:
+                self.stats.stale_hits += 1
+                self._start_refresh()
+            return snapshot
+
+        self.stats.misses += 1
+        # Shield so one cancelled caller doesn't abort the shared refresh
+        return await asyncio.shield(self._start_refresh())
+
+    async def refresh(self) -> SchemaSnapshot:
+        """Force a reload (joining one that is already running)."""
+        return await asyncio.shield(self._start_refresh(use_shared=False))
+
+    def invalidate(self) -> None:
+        """
+        Drop the current snapshot and reload it in the background.
+
+        Used when the schema is known to have changed (e.g. a DDL
+        notification), so callers wait for the new schema instead of
+        being served the old one.
+        """
+        self.stats.invalidations += 1
+        self._snapshot = None
+        # A refresh already in flight may have read the old catalog
+        self._generation += 1
+        self._inflight = None
+        try:
+            self._start_refresh(use_shared=False)
+        except RuntimeError:
+            # No running event loop: the next get() will load it
+            pass
+
+    def _start_refresh(self, use_shared: bool = True) -> "asyncio.Task[SchemaSnapshot]":
+        if self._inflight is None or self._inflight.done():
+            task = asyncio.get_running_loop().create_task(
+                self._do_refresh(self._generation, use_shared)
+            )
+            task.add_done_callback(_consume_exception)
+            self._inflight = task
+        return self._inflight
+
+    async def _do_refresh(self, generation: int, use_shared: bool = True) -> SchemaSnapshot:
+        if use_shared and self.shared is not None:
+            snapshot = await self._load_shared()
+            if snapshot is not None:
+                self.stats.shared_loads += 1
+                if generation == self._generation:
+                    self._snapshot = snapshot
+                return snapshot
+
+        started = time.perf_counter()
+        try:
+            tables = await self._loader()
+            text = render_schema(tables)
+        except Exception:
+            self.stats.refresh_errors += 1
+            logger.exception("Schema refresh failed")
+            raise
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.stats.refreshes += 1
+        self.stats.last_refresh_ms = elapsed_ms
+        self.stats.total_refresh_ms += elapsed_ms
+
+        snapshot = SchemaSnapshot(
+            text=text,
+            version=schema_version(text),
+            loaded_at=time.monotonic(),
+            tables=tables,
+        )
+        if generation == self._generation:
+            self._snapshot = snapshot
+            if self.shared is not None:
+                data = pack((text, snapshot.version, tables, time.time()))
+                if data is not None:
+                    await self.shared.set("schema", data, self.ttl)
+        return snapshot
+
+    async def _load_shared(self) -> SchemaSnapshot | None:
+        """The snapshot another worker stored, if younger than the TTL."""
+        assert self.shared is not None
+        data = await self.shared.get("schema")
+        value = unpack(data) if data is not None else None
+        if value is None:
+            return None
+        text, version, tables, stored_at = value
+        age = time.time() - stored_at
+        if age >= self.ttl:
+            return None
+        return SchemaSnapshot(
+            text=text,
+            version=version,
+            loaded_at=time.monotonic() - age,
+            tables=tables,
+        )
+
+
+def _consume_exception(task: asyncio.Task) -> None:
+    """Mark background refresh errors as retrieved (they are logged already)."""
+    if not task.cancelled():
+        task.exception()
@@ -0,0 +1,72 @@
+"""
+Prepared Statement Cache for CASS
+=================================
+Repeated queries reuse their server-side prepared statement (and plan)
+instead of being parsed and planned again, and the pool counts how often
+that happens.
+
+asyncpg already keeps an LRU of prepared statements per connection, but
+only fetch()/cursor() go through it; Connection.prepare() always prepares
+afresh, and a PreparedStatement object dies with the pool acquisition that
+created it. CachingConnection.prepare_cached() returns a statement backed
+by the connection's cache, and mirrors the cache's keys to tell a first
+prepare from a reuse.
+
+PostgresRunner creates its pool with connection_class=CachingConnection.
+"""
+
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+
+import asyncpg
+from asyncpg.prepared_stmt import PreparedStatement
+
+# Same as asyncpg's default; larger statements are never cached
+MAX_CACHEABLE_STATEMENT_SIZE = 15 * 1024
+
+
+@dataclass
+class StatementCacheStats:
+    """Prepare/reuse counters, shared by all connections of a pool."""
+    prepares: int = 0
+    reuses: int = 0
+    invalidations: int = 0
+
+    @property
+    def reuse_rate(self) -> float:
+        total = self.prepares + self.reuses
+        return self.reuses / total if total else 0.0
+
+    def as_dict(self) -> dict[str, float]:
+        return {**asdict(self), "reuse_rate": self.reuse_rate}
+
+
+class CachingConnection(asyncpg.Connection):
+    """asyncpg connection whose prepared statements come from its statement cache."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.statement_cache_size = 100  # keep in step with the pool setting
+        self.statement_stats = StatementCacheStats()
+        self._cached_sql: OrderedDict[str, None] = OrderedDict()
+
+    async def prepare_cached(self, sql: str) -> PreparedStatement:
+        """Prepared statement for `sql`, reused across calls on this connection."""
+        stmt = await self._prepare(sql, use_cache=True)
+        if sql in self._cached_sql:
+            self._cached_sql.move_to_end(sql)
+            self.statement_stats.reuses += 1
+            return stmt
+
+        self.statement_stats.prepares += 1
+        if 0 < self.statement_cache_size and len(sql) <= MAX_CACHEABLE_STATEMENT_SIZE:
+            self._cached_sql[sql] = None
+            while len(self._cached_sql) > self.statement_cache_size:
+                self._cached_sql.popitem(last=False)
+        return stmt
+
+    async def forget_prepared(self) -> None:
+        """Drop cached statements after the schema changed under their plans."""
+        self._cached_sql.clear()
+        self.statement_stats.invalidations += 1
+        await self.reload_schema_state()
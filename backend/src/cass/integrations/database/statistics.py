@@ -0,0 +1,285 @@
+"""
+Statistics Catalog for CASS
+===========================
+What the planner knows about the data, condensed for the LLM prompt:
+estimated row counts (pg_class.reltuples), indexes, foreign keys, and the
+values of low-cardinality columns (pg_stats most-common values). With it
+the model can filter on indexed columns, see which tables are big, and use
+real values for columns like orders.status instead of guessing.
+
+The catalog is loaded at startup and refreshed in the background; it is
+read from the planner's statistics, so it costs no table scans. Each
+table's text is rendered once per refresh and rendered tables are picked
+within a token budget, biggest tables first.
+
+Rendered form, per table:
+    orders ~1.0M rows
+      indexes: orders_pkey (id) unique; idx_orders_date (order_date)
+      references: (customer_id) -> customers(id)
+      status: 'delivered', 'shipped', 'pending', 'processing', 'cancelled'
+"""
+
+import asyncio
+import logging
+import re
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Awaitable, Callable
+
+import asyncpg
+
+from cass.core.schema import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+ROWS_QUERY = """
+    SELECT c.relname, c.reltuples::bigint AS row_estimate
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = 'public' AND c.relkind IN ('r', 'p', 'm')
+"""
+
+# Key columns via pg_get_indexdef(oid, k) so expression indexes read right
+INDEXES_QUERY = """
+    SELECT t.relname AS table_name,
+           i.relname AS index_name,
+           ix.indisunique AS is_unique,
+           ix.indpred IS NOT NULL AS is_partial,
+           am.amname AS method,
+           array(
+               SELECT pg_get_indexdef(ix.indexrelid, k, true)
+               FROM generate_series(1, ix.indnkeyatts) k
+           ) AS columns
+    FROM pg_index ix
+    JOIN pg_class t ON t.oid = ix.indrelid
+    JOIN pg_class i ON i.oid = ix.indexrelid
+    JOIN pg_namespace n ON n.oid = t.relnamespace
+    JOIN pg_am am ON am.oid = i.relam
+    WHERE n.nspname = 'public'
+    ORDER BY t.relname, ix.indisprimary DESC, i.relname
+"""
+
+FOREIGN_KEYS_QUERY = """
+    SELECT cl.relname AS table_name, pg_get_constraintdef(con.oid) AS definition
+    FROM pg_constraint con
+    JOIN pg_class cl ON cl.oid = con.conrelid
+    JOIN pg_namespace n ON n.oid = cl.relnamespace
+    WHERE con.contype = 'f' AND n.nspname = 'public'
+    ORDER BY cl.relname, con.conname
+"""
+
+# Columns with only a handful of distinct values, and those values. Dates
+# and numbers are left out: their values are rarely what a question names
+VALUES_QUERY = """
+    SELECT s.tablename, s.attname, (s.most_common_vals::text)::text[] AS common_values
+    FROM pg_stats s
+    JOIN pg_namespace n ON n.nspname = s.schemaname
+    JOIN pg_class c ON c.relnamespace = n.oid AND c.relname = s.tablename
+    JOIN pg_attribute a ON a.attrelid = c.oid AND a.attname = s.attname
+    JOIN pg_type t ON t.oid = a.atttypid
+    WHERE s.schemaname = 'public'
+      AND NOT s.inherited
+      AND s.n_distinct > 0 AND s.n_distinct <= $1
+      AND s.most_common_vals IS NOT NULL
+      AND t.typcategory NOT IN ('D', 'N')
+    ORDER BY s.tablename, s.attname
+"""
+
+_FK_PATTERN = re.compile(r"FOREIGN KEY (\(.*?\)) REFERENCES (\S+?\(.*?\))")
+# Characters kept of each common value
+_VALUE_CHARS = 40
+
+
+@dataclass(slots=True)
+class TableStatistics:
+    """Planner statistics for one table, ready to render."""
+    name: str
+    row_estimate: int | None = None  # None until the table is analyzed
+    indexes: list[str] = field(default_factory=list)  # "name (cols) unique"
+    references: list[str] = field(default_factory=list)  # "(col) -> table(col)"
+    values: dict[str, list[str]] = field(default_factory=dict)  # column -> common values
+
+    def render(self) -> str:
+        if self.row_estimate is None:
+            lines = [f"{self.name} (not analyzed)"]
+        else:
+            lines = [f"{self.name} ~{_human_count(self.row_estimate)} rows"]
+        if self.indexes:
+            lines.append(f"  indexes: {'; '.join(self.indexes)}")
+        if self.references:
+            lines.append(f"  references: {'; '.join(self.references)}")
+        for column, values in self.values.items():
+            lines.append(f"  {column}: {', '.join(values)}")
+        return "\n".join(lines)
+
+
+def _human_count(count: int) -> str:
+    if count >= 1_000_000:
+        return f"{count / 1_000_000:.1f}M"
+    if count >= 10_000:
+        return f"{count // 1000}k"
+    return str(count)
+
+
+def _literal(value: str) -> str:
+    if len(value) > _VALUE_CHARS:
+        value = value[:_VALUE_CHARS] + "..."
+    return "'" + value.replace("'", "''") + "'"
+
+
+async def load_statistics(conn: asyncpg.Connection, max_values: int = 20) -> list[TableStatistics]:
+    """
+    Read the statistics catalog.
+
+    Args:
+        conn: Connection to read the catalogs with
+        max_values: Columns with at most this many distinct values get
+            their values listed
+    """
+    tables: dict[str, TableStatistics] = {}
+
+    def table(name: str) -> TableStatistics:
+        stats = tables.get(name)
+        if stats is None:
+            stats = tables[name] = TableStatistics(name=name)
+        return stats
+
+    for row in await conn.fetch(ROWS_QUERY):
+        # reltuples is -1 for a table that was never analyzed (PostgreSQL 14+)
+        table(row["relname"]).row_estimate = row["row_estimate"] if row["row_estimate"] >= 0 else None
+
+    for row in await conn.fetch(INDEXES_QUERY):
+        text = f"{row['index_name']} ({', '.join(row['columns'])})"
+        if row["method"] != "btree":
+            text += f" {row['method']}"
+        if row["is_unique"]:
+            text += " unique"
+        if row["is_partial"]:
+            text += " partial"
+        table(row["table_name"]).indexes.append(text)
+
+    for row in await conn.fetch(FOREIGN_KEYS_QUERY):
+        match = _FK_PATTERN.match(row["definition"])
+        if match:
+            table(row["table_name"]).references.append(f"{match.group(1)} -> {match.group(2)}")
+
+    for row in await conn.fetch(VALUES_QUERY, max_values):
+        values = [_literal(value) for value in row["common_values"][:max_values]]
+        table(row["tablename"]).values[row["attname"]] = values
+
+    return list(tables.values())
+
+
+@dataclass
+class StatisticsCatalogStats:
+    """Refresh counters for the statistics catalog."""
+    refreshes: int = 0
+    refresh_errors: int = 0
+    last_refresh_ms: float = 0.0
+    tables: int = 0
+
+    def as_dict(self) -> dict[str, float]:
+        return asdict(self)
+
+
+class StatisticsCatalog:
+    """
+    The statistics of every table, reloaded every `refresh_interval` seconds.
+
+    Usage:
+        catalog = StatisticsCatalog(runner._load_statistics, refresh_interval=600)
+        await catalog.start()
+        text = catalog.render(["orders", "customers"], token_budget=500)
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], Awaitable[list[TableStatistics]]],
+        refresh_interval: float = 600.0,
+    ) -> None:
+        """
+        Args:
+            loader: Coroutine function that reads the catalog
+            refresh_interval: Seconds between background reloads
+        """
+        self._loader = loader
+        self.refresh_interval = refresh_interval
+        self.stats = StatisticsCatalogStats()
+        self._tables: dict[str, TableStatistics] = {}
+        # name -> (rendered text, its tokens), rebuilt on refresh
+        self._rendered: dict[str, tuple[str, int]] = {}
+        self._refresher: asyncio.Task | None = None
+
+    def __contains__(self, table: str) -> bool:
+        return table in self._tables
+
+    def get(self, table: str) -> TableStatistics | None:
+        return self._tables.get(table)
+
+    async def refresh(self) -> None:
+        """Reload the catalog now."""
+        started = time.perf_counter()
+        try:
+            tables = await self._loader()
+            rendered = {}
+            for stats in tables:
+                text = stats.render()
+                rendered[stats.name] = (text, estimate_tokens(text) + 1)
+        except Exception:
+            self.stats.refresh_errors += 1
+            raise
+        # Swap both at once, so a failed refresh keeps the previous catalog
+        self._tables = {stats.name: stats for stats in tables}
+        self._rendered = rendered
+        self.stats.refreshes += 1
+        self.stats.tables = len(tables)
+        self.stats.last_refresh_ms = (time.perf_counter() - started) * 1000
+
+    async def start(self) -> None:
+        """Load the catalog, then keep refreshing it in the background."""
+        if self._refresher is None:
+            try:
+                await self.refresh()
+            except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+                logger.warning("Could not load table statistics: %s", e)
+            except Exception:
+                logger.exception("Could not load table statistics")
+            self._refresher = asyncio.create_task(self._refresh_forever())
+
+    async def _refresh_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+                logger.warning("Could not refresh table statistics: %s", e)
+            except Exception:
+                # Anything else must not end the loop either (cancellation
+                # is a BaseException and still stops it)
+                logger.exception("Could not refresh table statistics")
+
+    def render(self, tables: list[str], token_budget: int) -> str:
+        """
+        Statistics of `tables` as prompt text, within about token_budget tokens.
+
+        When not all fit, the biggest tables win (that is where a full scan
+        hurts); the output keeps the order of `tables`.
+        """
+        candidates = [name for name in tables if name in self._rendered]
+        by_size = sorted(
+            candidates, key=lambda name: -(self._tables[name].row_estimate or 0)
+        )
+        chosen: set[str] = set()
+        used = 0
+        for name in by_size:
+            tokens = self._rendered[name][1]
+            if used + tokens > token_budget:
+                continue
+            chosen.add(name)
+            used += tokens
+        return "\n".join(self._rendered[name][0] for name in candidates if name in chosen)
+
+    async def close(self) -> None:
+        if self._refresher is not None:
+            self._refresher.cancel()
+            self._refresher = None
@@ -1,23 +1,88 @@
+import asyncio
 import json
+import logging
+import time
 
 import httpx
 from typing import AsyncIterator
 
 from cass.core.llm import LlmProvider, LlmMessage, LlmResponse, Role
+from cass.core.telemetry import telemetry
+
+logger = logging.getLogger(__name__)
+
+
+def context_size(
+    prompt_tokens: int, num_predict: int, minimum: int = 2048, maximum: int = 32768
+) -> int:
+    """
+    A num_ctx that fits prompts of up to `prompt_tokens` plus the answer.
+
+    Adds 25% because token counts are estimates, and rounds up to a multiple
+    of 1024. Pick it once: Ollama reloads the model whenever num_ctx changes.
+    """
+    needed = int((prompt_tokens + num_predict) * 1.25)
+    return max(minimum, min(maximum, -(-needed // 1024) * 1024))
 
 
 class OllamaProvider(LlmProvider):
     """LLM provider using local Ollama installation."""
-    
+
     def __init__(
         self,
         base_url: str = "http://localhost:11434",
         model: str = "llama3.2",
         timeout: int = 120,
+        max_connections: int = 10,
+        max_keepalive_connections: int = 10,
+        keep_alive: str | int | None = None,
+        num_ctx: int | None = None,
+        num_predict: int | None = None,
+        stop: list[str] | None = None,
     ) -> None:
+        """
+        Args:
+            keep_alive: How long Ollama keeps the model loaded after a
+                request ("30m", seconds, -1 for ever; None = server default)
+            num_ctx: Context window (None = the model's default)
+            num_predict: Maximum tokens to generate
+            stop: Sequences that end generation
+        """
         self.base_url = base_url
         self.model = model
         self.timeout = timeout
+        self.keep_alive = keep_alive
+        self.num_ctx = num_ctx
+        self.num_predict = num_predict
+        self.stop = stop
+        self._last_used = time.monotonic()
+        self._keep_warm_task: asyncio.Task | None = None
+        # One pooled client per provider, so calls reuse keep-alive connections
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+        )
+        self._client: httpx.AsyncClient | None = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The shared HTTP client (created on first use)."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=self._limits,
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        """Stop keep-warm pings and close the pooled HTTP connections."""
+        if self._keep_warm_task is not None:
+            self._keep_warm_task.cancel()
+            self._keep_warm_task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
     def _format_messages(self, messages: list[LlmMessage]) -> list[dict]:
         """Convert LlmMessage objects to Ollama format."""
@@ -26,41 +91,110 @@ class OllamaProvider(LlmProvider):
             for msg in messages
         ]
 
-    async def chat(self, messages: list[LlmMessage]) -> LlmResponse:
+    def _payload(self, messages: list[LlmMessage], stream: bool, **options: object) -> dict:
+        """Request body with keep_alive and the generation options."""
+        self._last_used = time.monotonic()
+        options = {
+            "num_ctx": self.num_ctx,
+            "num_predict": self.num_predict,
+            "stop": self.stop,
+            **options,
+        }
+        payload = {
+            "model": self.model,
+            "messages": self._format_messages(messages),
+            "stream": stream,
+            "options": {key: value for key, value in options.items() if value is not None},
+        }
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        return payload
+
+    async def chat(
+        self, messages: list[LlmMessage], temperature: float | None = None
+    ) -> LlmResponse:
         """Send messages to Ollama and get a response."""
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
-                f"{self.base_url}/api/chat",
-                json={
-                    "model": self.model,
-                    "messages": self._format_messages(messages),
-                    "stream": False
-                }
-            )
-            response.raise_for_status()
-            data = response.json()
-            
-            return LlmResponse(
-                content=data["message"]["content"],
-                model=self.model,
-                tokens_used=data.get("eval_count", 0)
-            )
+        payload = self._payload(messages, stream=False, temperature=temperature)
+        response = await self.client.post("/api/chat", json=payload)
+        response.raise_for_status()
+        data = response.json()
+        self._record_usage(data)
+
+        return LlmResponse(
+            content=data["message"]["content"],
+            model=self.model,
+            tokens_used=data.get("eval_count", 0)
+        )
 
     async def chat_stream(self, messages: list[LlmMessage]) -> AsyncIterator[str]:
         """Stream response from Ollama token by token."""
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            async with client.stream(
-                "POST",
-                f"{self.base_url}/api/chat",
-                json={
-                    "model": self.model,
-                    "messages": self._format_messages(messages),
-                    "stream": True
-                }
-            ) as response:
-                response.raise_for_status()
-                async for line in response.aiter_lines():
-                    if line:
-                        data = json.loads(line)
-                        if "message" in data:
-                            yield data["message"]["content"]
+        started = time.perf_counter()
+        first = True
+        async with self.client.stream(
+            "POST", "/api/chat", json=self._payload(messages, stream=True)
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line:
+                    data = json.loads(line)
+                    if "message" in data:
+                        if first:
+                            telemetry.observe("llm.first_token", time.perf_counter() - started)
+                            first = False
+                        yield data["message"]["content"]
+                    if data.get("done"):
+                        self._record_usage(data)
+
+    async def warm_up(self, messages: list[LlmMessage] | None = None) -> float:
+        """
+        Load the model (and optionally evaluate a prompt prefix) ahead of use.
+
+        With no messages Ollama only loads the model. With the prompt prefix
+        every request starts with (system prompt, schema), it also evaluates
+        it once, so the first real request finds it in the KV cache.
+        Uses the same num_ctx as requests; a different one would reload the
+        model. Returns the seconds it took.
+        """
+        started = time.perf_counter()
+        payload = self._payload(messages or [], stream=False, num_predict=1)
+        response = await self.client.post("/api/chat", json=payload)
+        response.raise_for_status()
+        return time.perf_counter() - started
+
+    def start_keep_warm(self, interval: float) -> None:
+        """
+        Ping Ollama whenever the provider has been idle for `interval`
+        seconds, so the model is not unloaded between quiet periods. Keep the
+        interval under half of keep_alive. Stopped by aclose().
+        """
+        if self._keep_warm_task is None:
+            self._keep_warm_task = asyncio.create_task(self._keep_warm(interval))
+
+    async def _keep_warm(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            if time.monotonic() - self._last_used < interval:
+                continue
+            try:
+                await self.warm_up()
+            except httpx.HTTPError as e:
+                logger.warning("Keep-warm ping to Ollama (%s) failed: %r", self.model, e)
+            except Exception:
+                # Anything else must not end the loop either (cancellation
+                # is a BaseException and still stops it)
+                logger.exception("Keep-warm ping to Ollama (%s) failed", self.model)
+
+    def _record_usage(self, data: dict) -> None:
+        """Report the token counts and timings Ollama returns with the final message."""
+        if not telemetry.enabled:
+            return
+        telemetry.count_tokens(
+            self.model,
+            prompt=data.get("prompt_eval_count", 0),
+            completion=data.get("eval_count", 0),
+        )
+        # Durations are in nanoseconds
+        if data.get("prompt_eval_duration"):
+            telemetry.observe("llm.prompt_eval", data["prompt_eval_duration"] / 1e9)
+        if data.get("eval_duration"):
+            telemetry.observe("llm.generation", data["eval_duration"] / 1e9)
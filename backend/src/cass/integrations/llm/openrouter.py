@@ -1,8 +1,17 @@
 import json
+import time
+
 import httpx
 from typing import AsyncIterator
 
 from cass.core.llm import LlmProvider, LlmMessage, LlmResponse
+from cass.core.telemetry import telemetry
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
 
 class OpenRouterProvider(LlmProvider):
@@ -12,12 +21,46 @@ class OpenRouterProvider(LlmProvider):
         self,
         api_key: str,
         model: str = "deepseek/deepseek-chat",
-        timeout: int = 120
+        timeout: int = 120,
+        base_url: str = "https://openrouter.ai/api/v1",
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        http2: bool = HTTP2_AVAILABLE,
     ) -> None:
         self.api_key = api_key
         self.model = model
         self.timeout = timeout
-        self.base_url = "https://openrouter.ai/api/v1"
+        self.base_url = base_url
+        # One pooled client per provider: keeps TLS sessions alive between
+        # calls and multiplexes requests over HTTP/2 when `h2` is installed
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+        )
+        self._http2 = http2 and HTTP2_AVAILABLE
+        self._client: httpx.AsyncClient | None = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The shared HTTP client (created on first use)."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=self._limits,
+                http2=self._http2,
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        """Close the pooled HTTP connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
     def _format_messages(self, messages: list[LlmMessage]) -> list[dict]:
         """Convert LlmMessage objects to OpenRouter format."""
@@ -26,56 +69,55 @@ class OpenRouterProvider(LlmProvider):
             for msg in messages
         ]
 
-    async def chat(self, messages: list[LlmMessage]) -> LlmResponse:
+    async def chat(
+        self, messages: list[LlmMessage], temperature: float | None = None
+    ) -> LlmResponse:
         """Send messages to OpenRouter and get a response."""
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
+        payload = {
+            "model": self.model,
+            "messages": self._format_messages(messages),
+            "stream": False
         }
+        if temperature is not None:
+            payload["temperature"] = temperature
+        response = await self.client.post("/chat/completions", json=payload)
+        response.raise_for_status()
+        data = response.json()
+        usage = data.get("usage", {})
+        telemetry.count_tokens(
+            self.model,
+            prompt=usage.get("prompt_tokens", 0),
+            completion=usage.get("completion_tokens", 0),
+        )
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
-                f"{self.base_url}/chat/completions",
-                headers=headers,
-                json={
-                    "model": self.model,
-                    "messages": self._format_messages(messages),
-                    "stream": False
-                }
-            )
-            response.raise_for_status()
-            data = response.json()
-
-            return LlmResponse(
-                content=data["choices"][0]["message"]["content"],
-                model=self.model,
-                tokens_used=data.get("usage", {}).get("total_tokens", 0)
-            )
+        return LlmResponse(
+            content=data["choices"][0]["message"]["content"],
+            model=self.model,
+            tokens_used=data.get("usage", {}).get("total_tokens", 0)
+        )
 
     async def chat_stream(self, messages: list[LlmMessage]) -> AsyncIterator[str]:
         """Stream response from OpenRouter token by token."""
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            async with client.stream(
-                "POST",
-                f"{self.base_url}/chat/completions",
-                headers=headers,
-                json={
-                    "model": self.model,
-                    "messages": self._format_messages(messages),
-                    "stream": True
-                }
-            ) as response:
-                response.raise_for_status()
-                async for line in response.aiter_lines():
-                    if line.startswith("data: "):
-                        data_str = line[6:]  # Remove "data: " prefix
-                        if data_str == "[DONE]":
-                            break
-                        data = json.loads(data_str)
-                        if data["choices"][0].get("delta", {}).get("content"):
-                            yield data["choices"][0]["delta"]["content"]
+        started = time.perf_counter()
+        first = True
+        async with self.client.stream(
+            "POST",
+            "/chat/completions",
+            json={
+                "model": self.model,
+                "messages": self._format_messages(messages),
+                "stream": True
+            }
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.startswith("data: "):
+                    data_str = line[6:]  # Remove "data: " prefix
+                    if data_str == "[DONE]":
+                        break
+                    data = json.loads(data_str)
+                    if data["choices"][0].get("delta", {}).get("content"):
+                        if first:
+                            telemetry.observe("llm.first_token", time.perf_counter() - started)
+                            first = False
+                        yield data["choices"][0]["delta"]["content"]
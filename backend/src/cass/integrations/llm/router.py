@@ -0,0 +1,440 @@
+"""
+LLM Router
+==========
+An LlmProvider that spreads requests over several backends (models or
+hosts) and sends each one to the fastest healthy backend.
+
+- Every backend keeps an EWMA of its latency and error rate, plus a window
+  of recent latencies for its p95
+- If the chosen backend hasn't answered after its p95 latency, the request
+  is hedged: the same request goes to the next backend and the first answer
+  wins (the other is cancelled)
+- A backend that fails repeatedly trips its circuit breaker and is skipped
+  until a cooldown has passed; then a single probe request decides whether
+  it is closed again
+- A backend that refuses a request for lack of capacity (AdmissionError
+  from an AdmissionControlledProvider) is not counted as failing; the
+  request fails over to the next backend
+
+Usage:
+    llm = LlmRouter([
+        ("ollama/sqlcoder", OllamaProvider(model="sqlcoder:7b")),
+        ("openrouter", OpenRouterProvider(api_key=...)),
+    ])
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+
+from cass.core.admission import AdmissionError
+from cass.core.llm import LlmMessage, LlmProvider, LlmResponse
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class NoHealthyBackendError(AdmissionError):
+    """Every backend's circuit breaker is open (HTTP 503)."""
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures; lets one probe through after a cooldown."""
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.trips = 0
+        self._opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return CLOSED
+        if time.monotonic() - self._opened_at >= self.cooldown:
+            return HALF_OPEN
+        return OPEN
+
+    @property
+    def retry_after(self) -> float:
+        """Seconds until an open breaker lets a probe through."""
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+
+    @property
+    def available(self) -> bool:
+        """Whether a request may be sent now."""
+        state = self.state
+        return state == CLOSED or (state == HALF_OPEN and not self._probing)
+
+    def started(self) -> None:
+        """A request was sent; in half-open state it is the probe."""
+        if self.state == HALF_OPEN:
+            self._probing = True
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self._probing or self.consecutive_failures >= self.failure_threshold:
+            if self._opened_at is None or self._probing:
+                self.trips += 1
+            self._opened_at = time.monotonic()
+        self._probing = False
+
+    def abandoned(self) -> None:
+        """The request was cancelled before it finished (e.g. it lost a hedge)."""
+        self._probing = False
+
+
+class LatencyTracker:
+    """EWMA plus a window of recent samples (for percentiles)."""
+
+    def __init__(self, alpha: float = 0.2, window: int = 100) -> None:
+        self.alpha = alpha
+        self.ewma_ms: float | None = None
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, ms: float) -> None:
+        self._samples.append(ms)
+        if self.ewma_ms is None:
+            self.ewma_ms = ms
+        else:
+            self.ewma_ms += self.alpha * (ms - self.ewma_ms)
+
+    def percentile(self, q: float) -> float | None:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+
+@dataclass
+class BackendStats:
+    """Counters for one backend."""
+    requests: int = 0
+    successes: int = 0
+    failures: int = 0
+    cancelled: int = 0
+    saturated: int = 0  # refused by the backend's admission control
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+class Backend:
+    """One routed provider with its health and latency state."""
+
+    def __init__(
+        self,
+        name: str,
+        provider: LlmProvider,
+        alpha: float = 0.2,
+        window: int = 100,
+        breaker: CircuitBreaker | None = None,
+    ) -> None:
+        self.name = name
+        self.provider = provider
+        self.alpha = alpha
+        self.latency = LatencyTracker(alpha, window)  # full chat() responses
+        self.first_token = LatencyTracker(alpha, window)  # chat_stream() first token
+        self.error_rate = 0.0  # EWMA of failures (1) and successes (0)
+        self.breaker = breaker or CircuitBreaker()
+        self.stats = BackendStats()
+
+    def score(self, tracker: LatencyTracker) -> float:
+        """Expected latency, inflated by the error rate; unmeasured backends go first."""
+        if tracker.ewma_ms is None:
+            return 0.0
+        return tracker.ewma_ms / max(1.0 - self.error_rate, 0.05)
+
+    def started(self) -> None:
+        self.stats.requests += 1
+        self.breaker.started()
+
+    def succeeded(self) -> None:
+        self.stats.successes += 1
+        self.error_rate *= 1 - self.alpha
+        self.breaker.record_success()
+
+    def failed(self) -> None:
+        self.stats.failures += 1
+        self.error_rate += self.alpha * (1 - self.error_rate)
+        self.breaker.record_failure()
+
+    def abandoned(self) -> None:
+        self.stats.cancelled += 1
+        self.breaker.abandoned()
+
+    def saturated(self) -> None:
+        """Refused for lack of capacity: says nothing about its health."""
+        self.stats.saturated += 1
+        self.breaker.abandoned()
+
+    def as_dict(self) -> dict:
+        p95 = self.latency.percentile(0.95)
+        ttft_p95 = self.first_token.percentile(0.95)
+        return {
+            **self.stats.as_dict(),
+            "state": self.breaker.state,
+            "trips": self.breaker.trips,
+            "error_rate": round(self.error_rate, 3),
+            "latency_ewma_ms": _round(self.latency.ewma_ms),
+            "latency_p95_ms": _round(p95),
+            "first_token_ewma_ms": _round(self.first_token.ewma_ms),
+            "first_token_p95_ms": _round(ttft_p95),
+        }
+
+
+def _round(value: float | None) -> float | None:
+    return None if value is None else round(value, 2)
+
+
+@dataclass
+class RouterStats:
+    """Counters for the router as a whole."""
+    requests: int = 0
+    hedged: int = 0  # a second backend was started because the first was slow
+    hedge_wins: int = 0  # ...and the second backend answered first
+    failovers: int = 0  # a backend failed and the next one was tried
+    unavailable: int = 0  # every breaker was open
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+class LlmRouter(LlmProvider):
+    """Routes each request to the fastest healthy backend, with hedging."""
+
+    def __init__(
+        self,
+        backends: list[tuple[str, LlmProvider]],
+        hedge: bool = True,
+        hedge_quantile: float = 0.95,
+        hedge_min_delay: float = 0.05,
+        hedge_max_delay: float = 10.0,
+        min_samples: int = 5,
+        ewma_alpha: float = 0.2,
+        window: int = 100,
+        failure_threshold: int = 3,
+        cooldown: float = 30.0,
+    ) -> None:
+        """
+        Args:
+            backends: (name, provider) pairs; ties go to the earlier one
+            hedge: Start a second backend when the first is slower than usual
+            hedge_quantile: Latency percentile of the first backend after
+                which the request is hedged
+            hedge_min_delay: Lower bound for the hedge delay, in seconds
+            hedge_max_delay: Upper bound for the hedge delay, in seconds (also
+                used until a backend has min_samples latency samples)
+            min_samples: Samples needed before the percentile is trusted
+            ewma_alpha: Weight of the newest sample in the moving averages
+            window: Latency samples kept per backend
+            failure_threshold: Consecutive failures that open a breaker
+            cooldown: Seconds an open breaker waits before a probe
+        """
+        if not backends:
+            raise ValueError("LlmRouter needs at least one backend")
+        self.backends = [
+            Backend(name, provider, ewma_alpha, window, CircuitBreaker(failure_threshold, cooldown))
+            for name, provider in backends
+        ]
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_max_delay = hedge_max_delay
+        self.min_samples = min_samples
+        self.stats = RouterStats()
+
+    def ranked(self, streaming: bool = False) -> list[Backend]:
+        """Backends that may take a request, fastest first."""
+        healthy = [backend for backend in self.backends if backend.breaker.available]
+        return sorted(
+            healthy,
+            key=lambda b: b.score(b.first_token if streaming else b.latency),
+        )
+
+    def hedge_delay(self, backend: Backend, streaming: bool = False) -> float:
+        """Seconds to wait for `backend` before hedging to the next one."""
+        tracker = backend.first_token if streaming else backend.latency
+        percentile = tracker.percentile(self.hedge_quantile)
+        if percentile is None or len(tracker) < self.min_samples:
+            return self.hedge_max_delay
+        return min(max(percentile / 1000, self.hedge_min_delay), self.hedge_max_delay)
+
+    def _candidates(self, streaming: bool) -> list[Backend]:
+        self.stats.requests += 1
+        candidates = self.ranked(streaming)
+        if not candidates:
+            self.stats.unavailable += 1
+            retry_after = min(backend.breaker.retry_after for backend in self.backends)
+            raise NoHealthyBackendError(
+                "All LLM backends are failing; try again later", max(1, math.ceil(retry_after))
+            )
+        return candidates
+
+    async def _race(
+        self,
+        candidates: list[Backend],
+        start: Callable[[Backend], Awaitable[T]],
+        streaming: bool,
+    ) -> tuple[Backend, T]:
+        """
+        Run start(backend) on the first candidate, hedging to the next one
+        when it is slow and failing over when it errors.
+
+        Returns the first backend to succeed and its result; the others are
+        cancelled. Raises the last error if every candidate failed.
+        """
+        waiting = list(candidates)
+        pending: dict[asyncio.Task[T], Backend] = {}
+        hedged = False
+        last_error: Exception | None = None
+
+        def launch() -> None:
+            backend = waiting.pop(0)
+            backend.started()
+            pending[asyncio.create_task(start(backend))] = backend
+
+        launch()
+        try:
+            while pending:
+                timeout = None
+                if self.hedge and not hedged and waiting and len(pending) == 1:
+                    (primary,) = pending.values()
+                    timeout = self.hedge_delay(primary, streaming)
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    hedged = True
+                    self.stats.hedged += 1
+                    launch()
+                    continue
+                for task in done:
+                    backend = pending.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        if hedged and backend is not candidates[0]:
+                            self.stats.hedge_wins += 1
+                        return backend, task.result()
+                    logger.warning("LLM backend %s failed: %r", backend.name, error)
+                    last_error = error
+                    if waiting and not pending:
+                        self.stats.failovers += 1
+                        launch()
+        finally:
+            for task, backend in pending.items():
+                task.cancel()
+                backend.abandoned()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        assert last_error is not None
+        raise last_error
+
+    async def chat(
+        self, messages: list[LlmMessage], temperature: float | None = None
+    ) -> LlmResponse:
+        async def call(backend: Backend) -> LlmResponse:
+            started = time.perf_counter()
+            try:
+                response = await backend.provider.chat(messages, temperature=temperature)
+            except asyncio.CancelledError:
+                raise
+            except AdmissionError:
+                backend.saturated()
+                raise
+            except Exception:
+                backend.failed()
+                raise
+            backend.latency.record((time.perf_counter() - started) * 1000)
+            backend.succeeded()
+            return response
+
+        _, response = await self._race(self._candidates(streaming=False), call, streaming=False)
+        return response
+
+    async def chat_stream(self, messages: list[LlmMessage]) -> AsyncIterator[str]:
+        """
+        Stream from the backend that produces the first token first.
+
+        Hedging and failover happen before the first token only; once tokens
+        have been yielded, an error is passed on to the caller.
+        """
+        streams: dict[Backend, AsyncIterator[str]] = {}
+
+        async def first_token(backend: Backend) -> str | None:
+            started = time.perf_counter()
+            stream = streams[backend] = backend.provider.chat_stream(messages)
+            try:
+                token = await anext(stream, None)
+            except asyncio.CancelledError:
+                raise
+            except AdmissionError:
+                backend.saturated()
+                raise
+            except Exception:
+                backend.failed()
+                raise
+            backend.first_token.record((time.perf_counter() - started) * 1000)
+            return token
+
+        backend: Backend | None = None
+        try:
+            backend, token = await self._race(
+                self._candidates(streaming=True), first_token, streaming=True
+            )
+        finally:
+            # Close the losers' streams (and their HTTP responses)
+            for loser, stream in list(streams.items()):
+                if loser is not backend:
+                    await stream.aclose()
+
+        stream = streams[backend]
+        delivered = False
+        try:
+            if token is not None:
+                delivered = True
+                yield token
+                async for token in stream:
+                    yield token
+        except (asyncio.CancelledError, GeneratorExit):
+            # Callers stop reading once they have what they need (e.g. the
+            # SQL block is complete); the backend did its job by then
+            if delivered:
+                backend.succeeded()
+            else:
+                backend.abandoned()
+            raise
+        except Exception:
+            backend.failed()
+            raise
+        else:
+            backend.succeeded()
+        finally:
+            await stream.aclose()
+
+    async def aclose(self) -> None:
+        await asyncio.gather(*(backend.provider.aclose() for backend in self.backends))
+
+    def backend_stats(self) -> dict[str, dict]:
+        return {backend.name: backend.as_dict() for backend in self.backends}
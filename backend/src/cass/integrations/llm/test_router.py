@@ -0,0 +1,138 @@
+"""
+Tests for LlmRouter health accounting and per-backend admission control
+Run (from backend/): PYTHONPATH=src python -m pytest src/cass/integrations/llm/test_router.py
+"""
+
+import asyncio
+from typing import AsyncIterator
+
+from cass.core.admission import AdmissionControlledProvider, AdmissionController
+from cass.core.llm import LlmMessage, LlmProvider, LlmResponse, Role
+from cass.integrations.llm.router import CLOSED, HALF_OPEN, LlmRouter
+
+MESSAGES = [LlmMessage(role=Role.USER, content="How many orders?")]
+
+
+class StubProvider(LlmProvider):
+    """Streams fixed tokens, optionally after a delay."""
+
+    def __init__(self, tokens: list[str], delay: float = 0.0) -> None:
+        self.tokens = tokens
+        self.delay = delay
+
+    async def chat(self, messages, temperature=None) -> LlmResponse:
+        await asyncio.sleep(self.delay)
+        return LlmResponse(content="".join(self.tokens), model="stub", tokens_used=len(self.tokens))
+
+    async def chat_stream(self, messages) -> AsyncIterator[str]:
+        await asyncio.sleep(self.delay)
+        for token in self.tokens:
+            yield token
+
+
+async def _read(router: LlmRouter, count: int) -> list[str]:
+    """Read `count` tokens, then close the stream (like the SQL block scanner)."""
+    tokens = []
+    stream = router.chat_stream(MESSAGES)
+    async for token in stream:
+        tokens.append(token)
+        if len(tokens) == count:
+            break
+    await stream.aclose()
+    return tokens
+
+
+def test_stream_stopped_early_counts_as_success():
+    async def run():
+        router = LlmRouter([("a", StubProvider(["```sql\n", "SELECT 1", "\n```", " more"]))])
+        backend = router.backends[0]
+        backend.breaker.consecutive_failures = 2
+        backend.error_rate = 0.5
+
+        assert await _read(router, 3) == ["```sql\n", "SELECT 1", "\n```"]
+        assert backend.stats.successes == 1
+        assert backend.stats.cancelled == 0
+        assert backend.breaker.consecutive_failures == 0
+        assert backend.error_rate < 0.5
+
+    asyncio.run(run())
+
+
+def test_stream_stopped_early_closes_half_open_breaker():
+    async def run():
+        router = LlmRouter(
+            [("a", StubProvider(["a", "b", "c"]))], failure_threshold=1, cooldown=0.01
+        )
+        breaker = router.backends[0].breaker
+        breaker.record_failure()
+        await asyncio.sleep(0.02)
+        assert breaker.state == HALF_OPEN
+
+        await _read(router, 1)
+        assert breaker.state == CLOSED
+
+    asyncio.run(run())
+
+
+def test_losing_hedge_is_abandoned():
+    async def run():
+        slow, fast = StubProvider(["slow"], delay=0.5), StubProvider(["fast"])
+        router = LlmRouter([("slow", slow), ("fast", fast)], hedge_max_delay=0.05)
+
+        assert await _read(router, 1) == ["fast"]
+        slow_backend, fast_backend = router.backends
+        assert slow_backend.stats.cancelled == 1
+        assert slow_backend.stats.successes == 0
+        assert fast_backend.stats.successes == 1
+
+    asyncio.run(run())
+
+
+def test_hedge_holds_a_slot_on_each_backend():
+    async def run():
+        slow_slots, fast_slots = AdmissionController(1, 0), AdmissionController(1, 0)
+        router = LlmRouter(
+            [
+                ("slow", AdmissionControlledProvider(StubProvider(["slow"], delay=0.2), slow_slots)),
+                ("fast", AdmissionControlledProvider(StubProvider(["fast"], delay=0.2), fast_slots)),
+            ],
+            hedge_max_delay=0.05,
+        )
+        task = asyncio.create_task(router.chat(MESSAGES))
+        await asyncio.sleep(0.1)  # hedged by now
+        assert slow_slots.stats.active == 1
+        assert fast_slots.stats.active == 1
+        await task
+
+    asyncio.run(run())
+
+
+def test_saturated_backend_fails_over_without_tripping():
+    async def run():
+        full = AdmissionController(max_concurrent=1, max_queue=0)
+        await full.acquire()  # the only slot is taken
+        router = LlmRouter(
+            [
+                ("full", AdmissionControlledProvider(StubProvider(["a"]), full)),
+                ("free", AdmissionControlledProvider(StubProvider(["b"]), AdmissionController())),
+            ],
+            failure_threshold=1,
+        )
+        for _ in range(3):
+            response = await router.chat(MESSAGES)
+            assert response.content == "b"
+        full_backend = router.backends[0]
+        assert full_backend.stats.saturated == 3
+        assert full_backend.stats.failures == 0
+        assert full_backend.breaker.state == CLOSED
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_stream_stopped_early_counts_as_success()
+    test_stream_stopped_early_closes_half_open_breaker()
+    test_losing_hedge_is_abandoned()
+    test_hedge_holds_a_slot_on_each_backend()
+    test_saturated_backend_fails_over_without_tripping()
+    print("✅ All tests passed!")
@@ -0,0 +1,35 @@
+"""
+CASS Server Launcher
+====================
+Runs the API with uvicorn: API_WORKERS processes listening on
+API_HOST:API_PORT (see config.py).
+
+Every worker reads the same settings, so each one splits the DB pool and
+concurrency limits by API_WORKERS, and all of them use the shared cache.
+Several workers need JOBS_ENABLED=false: jobs can't move between workers.
+
+Usage (from backend/):
+    PYTHONPATH=src python -m cass.server
+"""
+
+import uvicorn
+
+from cass.server.config import check_workers, get_settings
+
+
+def main() -> None:
+    settings = get_settings()
+    try:
+        check_workers(settings)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    uvicorn.run(
+        "cass.server.app:app",
+        host=settings.api_host,
+        port=settings.api_port,
+        workers=settings.api_workers,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Response Formats
+================
+Content negotiation for query results. Clients pick a layout with the
+Accept header:
+
+    application/json                       rows: [{"col": value, ...}, ...]
+    application/vnd.cass.columnar+json     columns once + one array per column
+    application/vnd.apache.arrow.stream    Arrow IPC stream (needs pyarrow)
+    application/x-ndjson                   streamed row batches
+"""
+
+from enum import Enum
+
+
+class ResultFormat(str, Enum):
+    ROWS = "rows"
+    COLUMNAR = "columnar"
+    ARROW = "arrow"
+    NDJSON = "ndjson"
+
+
+JSON_MEDIA_TYPE = "application/json"
+COLUMNAR_MEDIA_TYPE = "application/vnd.cass.columnar+json"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+MEDIA_TYPES = {
+    JSON_MEDIA_TYPE: ResultFormat.ROWS,
+    COLUMNAR_MEDIA_TYPE: ResultFormat.COLUMNAR,
+    ARROW_MEDIA_TYPE: ResultFormat.ARROW,
+    NDJSON_MEDIA_TYPE: ResultFormat.NDJSON,
+}
+
+
+def negotiate(
+    accept: str | None,
+    allowed: frozenset[ResultFormat] = frozenset(ResultFormat),
+) -> ResultFormat:
+    """
+    Pick the result format for an Accept header.
+
+    Media types are tried in order of their q-value; anything unknown
+    (including */*) falls back to the default row layout.
+    """
+    if not accept:
+        return ResultFormat.ROWS
+
+    candidates: list[tuple[float, int, str]] = []
+    for position, part in enumerate(accept.split(",")):
+        media_type, *params = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        candidates.append((-quality, position, media_type.lower()))
+
+    for negative_quality, _, media_type in sorted(candidates):
+        result_format = MEDIA_TYPES.get(media_type)
+        if negative_quality < 0 and result_format in allowed:
+            return result_format
+    return ResultFormat.ROWS
@@ -0,0 +1,45 @@
+"""
+Request Timing
+==============
+ASGI middleware that records every HTTP request's latency in the
+`cass_http_request_duration_seconds` histogram, labelled by method, route
+template (so /tables/{table_name} is one series) and status.
+
+For streamed responses the time runs until the last byte is sent.
+"""
+
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from cass.core.telemetry import telemetry
+
+
+class RequestTimingMiddleware:
+    """Times HTTP requests while telemetry is enabled."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not telemetry.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            telemetry.request_seconds.observe(
+                time.perf_counter() - started,
+                (scope["method"], getattr(route, "path", "unmatched"), str(status)),
+            )
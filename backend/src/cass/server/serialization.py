@@ -0,0 +1,83 @@
+"""
+JSON Serialization
+==================
+The JSON encoder behind API responses, SSE events, NDJSON batches and
+stored job rows.
+
+With orjson installed, rows are encoded in native code: datetime, date,
+UUID and dataclasses directly, Decimal, timedelta, bytes and the rest of
+what asyncpg returns through json_default. Values orjson refuses (times
+with a time zone, integers over 64 bits) fall back to the json module for
+that one call; so does everything when orjson is missing. Either way the
+output is compact JSON with the same value rules (Decimal as a number,
+dates in ISO 8601, NaN as null with orjson).
+
+FastJSONResponse renders with this encoder. Returning one from an endpoint
+also skips FastAPI's jsonable_encoder pass over the content, which walks
+every row and value in Python before the response is rendered.
+"""
+
+import datetime
+import decimal
+import json
+import uuid
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # fall back to the json module
+    orjson = None
+
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+
+def orjson_available() -> bool:
+    return orjson is not None
+
+
+def json_default(value: Any) -> Any:
+    """JSON fallback for the types asyncpg returns (Decimal, datetime, UUID...)."""
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (bytes, memoryview)):
+        return bytes(value).hex()
+    return str(value)
+
+
+def _dumps_json(value: Any) -> str:
+    return json.dumps(value, default=json_default, separators=(",", ":"))
+
+
+def dumps_bytes(value: Any) -> bytes:
+    """Encode as UTF-8 JSON, understanding database values."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, default=json_default, option=_ORJSON_OPTIONS)
+        except TypeError:
+            pass  # e.g. a time with a time zone; json_default handles it
+    return _dumps_json(value).encode()
+
+
+def dumps(value: Any) -> str:
+    """Encode as JSON text, understanding database values."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, default=json_default, option=_ORJSON_OPTIONS).decode()
+        except TypeError:
+            pass
+    return _dumps_json(value)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with dumps_bytes (the app's default response class)."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
@@ -0,0 +1,279 @@
+"""
+Result Streaming
+================
+Helpers for sending query results to clients in chunks (NDJSON or SSE)
+instead of materializing the whole result set first, and the SSE event
+frames used by the streaming endpoints.
+
+LLM tokens are coalesced before they are framed (coalesce_tokens): the
+first token goes out at once, later ones are sent together every
+`interval` seconds or `max_chars` characters, so a fast model costs one
+frame and one write per batch rather than per token. A model slower than
+the interval still gets a frame per token, without added delay.
+
+sse_body() turns the events into the response body, optionally gzipped
+with a flush after every frame so the client never waits on the
+compressor.
+"""
+
+import asyncio
+import zlib
+from contextlib import aclosing
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncIterator, Callable
+
+from cass.server.serialization import dumps, json_default  # noqa: F401  (re-exported)
+
+# SSE frames: data: {"type": ..., "content": ...}. The part around the
+# content is fixed per event type, so only the content is encoded
+_SSE_PREFIX = 'data: {"type":"%s","content":'
+_SSE_SUFFIX = "}\n\n"
+TOKEN_FRAME_PREFIX = _SSE_PREFIX % "token"
+DATA_FRAME_PREFIX = _SSE_PREFIX % "data"
+
+
+def sse_event(event_type: str, content: Any = "") -> str:
+    """One SSE frame: data: {"type": event_type, "content": content}."""
+    return f"{_SSE_PREFIX % event_type}{dumps(content)}{_SSE_SUFFIX}"
+
+
+def token_event(token: str) -> str:
+    """SSE frame for one LLM token (the hot path of /chat/stream)."""
+    return f"{TOKEN_FRAME_PREFIX}{dumps(token)}{_SSE_SUFFIX}"
+
+
+def data_event(batch: str) -> str:
+    """SSE frame for a row batch that RowStream already encoded."""
+    return f"{DATA_FRAME_PREFIX}{batch}{_SSE_SUFFIX}"
+
+
+# Events without content, encoded once
+SSE_START = sse_event("start")
+SSE_END = sse_event("end")
+
+
+class RowStream:
+    """
+    Encodes row batches as JSON while enforcing row and byte limits.
+
+    Usage:
+        rows = RowStream(db.stream(sql, max_rows=limit + 1), max_rows=limit)
+        async for batch_json in rows:
+            ...  # send it
+        print(rows.row_count, rows.truncated)
+    """
+
+    def __init__(
+        self,
+        batches: AsyncIterator[list[dict[str, Any]]],
+        max_rows: int | None = None,
+        max_bytes: int | None = None,
+    ) -> None:
+        """
+        Args:
+            batches: Row batches, e.g. from PostgresRunner.stream()
+            max_rows: Stop after this many rows
+            max_bytes: Stop before the encoded output exceeds this size
+        """
+        self._batches = batches
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.row_count = 0
+        self.byte_count = 0
+        self.truncated = False
+        self.first_row: dict[str, Any] | None = None
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        # aclosing() releases the cursor/connection if we stop early
+        async with aclosing(self._batches) as batches:
+            async for batch in batches:
+                if self.max_rows is not None and self.row_count + len(batch) > self.max_rows:
+                    batch = batch[: self.max_rows - self.row_count]
+                    self.truncated = True
+
+                encoded = dumps(batch)
+                if self.max_bytes is not None and self.byte_count + len(encoded) > self.max_bytes:
+                    self.truncated = True
+                    break
+
+                if batch:
+                    if self.first_row is None:
+                        self.first_row = batch[0]
+                    self.row_count += len(batch)
+                    self.byte_count += len(encoded)
+                    yield encoded
+                if self.truncated:
+                    break
+
+    def summary(self) -> dict[str, Any]:
+        return {"row_count": self.row_count, "truncated": self.truncated}
+
+
+async def ndjson_rows(rows: RowStream) -> AsyncIterator[str]:
+    """
+    NDJSON body for a row stream: one line per batch, then a summary line.
+
+        {"type": "rows", "rows": [...]}
+        {"type": "end", "row_count": 1200, "truncated": false}
+    """
+    try:
+        async for batch in rows:
+            yield f'{{"type":"rows","rows":{batch}}}\n'
+    except Exception as e:
+        yield dumps({"type": "error", "error": str(e)}) + "\n"
+        return
+    yield dumps({"type": "end", **rows.summary()}) + "\n"
+
+
+@dataclass
+class SseStats:
+    """Frame counters for SSE responses."""
+    streams: int = 0
+    frames: int = 0
+    bytes: int = 0  # before compression
+    compressed_streams: int = 0
+    compressed_bytes: int = 0
+    tokens: int = 0
+    token_frames: int = 0
+
+    def as_dict(self) -> dict[str, float]:
+        stats: dict[str, float] = asdict(self)
+        stats["frames_per_stream"] = self.frames / self.streams if self.streams else 0.0
+        stats["tokens_per_frame"] = self.tokens / self.token_frames if self.token_frames else 0.0
+        return stats
+
+
+async def coalesce_tokens(
+    tokens: AsyncIterator[str],
+    interval: float,
+    max_chars: int,
+    stop: Callable[[str], bool] | None = None,
+    stats: SseStats | None = None,
+) -> AsyncIterator[str]:
+    """
+    Join streamed tokens into chunks worth a frame each.
+
+    A token is sent at once when nothing was sent in the last `interval`
+    seconds (so the first token, and every token of a slow stream, goes out
+    without delay); otherwise it waits for the rest of the interval or
+    until max_chars characters are waiting.
+
+    Args:
+        tokens: The LLM token stream (the caller closes it)
+        interval: Seconds between chunks (0 = a chunk per token)
+        max_chars: Send once this many characters are waiting
+        stop: Called with every token; once it returns True the waiting
+            text is sent and the stream ends (e.g. SqlBlockScanner.feed)
+        stats: Counts tokens and chunks
+    """
+    loop = asyncio.get_running_loop()
+    source = aiter(tokens)
+    waiting: list[str] = []
+    size = 0
+    sent_at = float("-inf")
+    pending: asyncio.Future | None = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(anext(source))
+            if waiting:
+                timeout = max(sent_at + interval - loop.time(), 0.0)
+                done, _ = await asyncio.wait((pending,), timeout=timeout)
+                if not done:
+                    # The interval is up before the next token: send what is waiting
+                    chunk, waiting, size = "".join(waiting), [], 0
+                    sent_at = loop.time()
+                    if stats is not None:
+                        stats.token_frames += 1
+                    yield chunk
+                    continue
+            try:
+                token = await pending
+            except StopAsyncIteration:
+                break
+            finally:
+                pending = None
+            if stats is not None:
+                stats.tokens += 1
+            waiting.append(token)
+            size += len(token)
+            stopping = stop is not None and stop(token)
+            if stopping or size >= max_chars or loop.time() - sent_at >= interval:
+                chunk, waiting, size = "".join(waiting), [], 0
+                sent_at = loop.time()
+                if stats is not None:
+                    stats.token_frames += 1
+                yield chunk
+            if stopping:
+                return
+        if waiting:
+            if stats is not None:
+                stats.token_frames += 1
+            yield "".join(waiting)
+    finally:
+        if pending is not None:
+            # Stopped early (or cancelled) while a token was being awaited
+            pending.cancel()
+            await asyncio.gather(pending, return_exceptions=True)
+
+
+def accepts_gzip(accept_encoding: str | None) -> bool:
+    """Whether an Accept-Encoding header allows gzip."""
+    for part in (accept_encoding or "").split(","):
+        coding, *params = [item.strip() for item in part.split(";")]
+        if coding.lower() not in ("gzip", "*"):
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        return quality > 0
+    return False
+
+
+async def sse_body(
+    events: AsyncIterator[str],
+    gzip: bool = False,
+    stats: SseStats | None = None,
+    on_finish: Callable[[int], None] | None = None,
+) -> AsyncIterator[bytes]:
+    """
+    The body of an SSE response.
+
+    Args:
+        events: SSE frames
+        gzip: Compress; every frame is followed by a sync flush, so it
+            reaches the client as soon as it is sent
+        stats: Counts frames and bytes
+        on_finish: Called with the number of frames once the stream ends
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if gzip else None
+    frames = 0
+    if stats is not None:
+        stats.streams += 1
+        stats.compressed_streams += int(gzip)
+    try:
+        async with aclosing(events) as events:
+            async for event in events:
+                data = event.encode()
+                frames += 1
+                if stats is not None:
+                    stats.frames += 1
+                    stats.bytes += len(data)
+                if compressor is not None:
+                    data = compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+                    if stats is not None:
+                        stats.compressed_bytes += len(data)
+                yield data
+        if compressor is not None:
+            tail = compressor.flush()
+            if stats is not None:
+                stats.compressed_bytes += len(tail)
+            yield tail
+    finally:
+        if on_finish is not None:
+            on_finish(frames)
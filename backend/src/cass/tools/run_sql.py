@@ -1,12 +1,24 @@
+from contextlib import aclosing
+from typing import Any, AsyncIterator
+
+from cass.core.cost_guard import CostGuard, PlanEstimate
 from cass.core.tool import Tool, ToolResult
 from cass.integrations.database.postgres import PostgresRunner
 
 
 class RunSQLTool(Tool):
-    """Tool for executing SQL queries on the database."""
+    """
+    Tool for executing SQL queries on the database.
+
+    With a CostGuard, every query gets a bounded LIMIT and is planned with
+    EXPLAIN first; plans over the guard's limits are rejected without
+    running, and the rest run with the guard's statement timeout (if it has
+    one). Queries always run in a read-only transaction.
+    """
 
-    def __init__(self, db: PostgresRunner) -> None:
+    def __init__(self, db: PostgresRunner, guard: CostGuard | None = None) -> None:
         self._db = db
+        self.guard = guard
 
     @property
     def name(self) -> str:
@@ -16,11 +28,66 @@ class RunSQLTool(Tool):
     def description(self) -> str:
         return "Executes a SQL query against on the database and returns the results."
 
-    async def execute(self, sql: str) -> ToolResult:
+    async def _guarded(self, sql: str, max_rows: int | None = None) -> tuple[str, PlanEstimate]:
+        """
+        The query with its LIMIT bounded, and its plan estimate.
+
+        Raises:
+            QueryRejected: The plan is over the guard's limits
+        """
+        assert self.guard is not None
+        sql = self.guard.limit(sql, max_rows)
+        plan = await self._db.explain_plan(sql, timeout=self.guard.limits.statement_timeout)
+        return sql, self.guard.check(plan)
+
+    async def execute(self, sql: str, columnar: bool = False) -> ToolResult:
         try:
-            results = await self._db.execute(sql)
+            timeout = None
+            if self.guard is not None:
+                sql, _ = await self._guarded(sql)
+                timeout = self.guard.limits.statement_timeout
+            if columnar:
+                results = await self._db.execute_columnar(sql, timeout=timeout, readonly=True)
+            else:
+                results = await self._db.execute(sql, timeout=timeout, readonly=True)
             return ToolResult(success=True, data=results)
         except Exception as e:
             return ToolResult(success=False, error=str(e))
 
+    async def validate(self, sql: str, guard: bool = True) -> ToolResult:
+        """
+        Check the query with EXPLAIN without running it.
+
+        data is the plan: a PlanEstimate when checked against the guard
+        (guard=False skips the guard's limits), else the plan's lines.
+        """
+        try:
+            if guard and self.guard is not None:
+                _, estimate = await self._guarded(sql)
+                return ToolResult(success=True, data=estimate)
+            plan = await self._db.explain(sql)
+            return ToolResult(success=True, data=plan)
+        except Exception as e:
+            return ToolResult(success=False, error=str(e))
+
+    async def stream(
+        self,
+        sql: str,
+        batch_size: int = 500,
+        max_rows: int | None = None,
+        timeout: float | None = None,
+    ) -> AsyncIterator[list[dict[str, Any]]]:
+        """
+        Execute the query and yield row batches (errors are raised).
 
+        With a guard, max_rows becomes the query's LIMIT and the guard's
+        statement timeout applies unless a timeout is given.
+        """
+        if self.guard is not None:
+            sql, _ = await self._guarded(sql, max_rows)
+            if timeout is None:
+                timeout = self.guard.limits.statement_timeout
+        batches = self._db.stream(sql, batch_size=batch_size, max_rows=max_rows, timeout=timeout)
+        async with aclosing(batches) as batches:
+            async for batch in batches:
+                yield batch
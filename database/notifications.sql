@@ -0,0 +1,66 @@
+-- =============================================================================
+-- CASS Change Notifications (optional)
+-- =============================================================================
+-- Triggers that tell the CASS backend about changes as they happen, instead
+-- of it finding out from its schema TTL and pg_stat_user_tables polling.
+-- Not part of schema.sql: the event trigger needs superuser rights (which
+-- managed Postgres services often don't grant), and the row triggers send a
+-- NOTIFY on every write. Load this after schema.sql only if you enable
+-- SCHEMA_LISTEN_FOR_DDL or RESULT_CACHE_LISTEN_FOR_CHANGES:
+--
+--     psql -d cassdb -f database/notifications.sql
+--
+-- Each section can be loaded on its own.
+-- =============================================================================
+
+-- -----------------------------------------------------------------------------
+-- Schema Change Notifications
+-- -----------------------------------------------------------------------------
+-- Lets the CASS backend (SCHEMA_LISTEN_FOR_DDL=true) refresh its cached schema
+-- as soon as a DDL command completes. Event triggers need superuser rights.
+
+CREATE OR REPLACE FUNCTION cass_notify_schema_change() RETURNS event_trigger AS $$
+BEGIN
+    PERFORM pg_notify('cass_schema_changed', tg_tag);
+END;
+$$ LANGUAGE plpgsql;
+
+DROP EVENT TRIGGER IF EXISTS cass_schema_changed;
+CREATE EVENT TRIGGER cass_schema_changed
+    ON ddl_command_end
+    EXECUTE FUNCTION cass_notify_schema_change();
+
+-- -----------------------------------------------------------------------------
+-- Row Change Notifications
+-- -----------------------------------------------------------------------------
+-- Lets the CASS backend (RESULT_CACHE_LISTEN_FOR_CHANGES=true) drop cached
+-- query results as soon as a table is written to, instead of waiting for the
+-- next pg_stat_user_tables poll. Statement-level, so bulk writes notify once
+-- (and duplicate notifications within a transaction are folded by Postgres).
+
+CREATE OR REPLACE FUNCTION cass_notify_table_change() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('cass_table_changed', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    t TEXT;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['categories', 'products', 'customers', 'orders', 'order_items'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS cass_table_changed ON %I', t);
+        EXECUTE format(
+            'CREATE TRIGGER cass_table_changed
+                AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I
+                FOR EACH STATEMENT EXECUTE FUNCTION cass_notify_table_change()',
+            t
+        );
+    END LOOP;
+END;
+$$;
+
+-- =============================================================================
+-- End of Change Notifications
+-- =============================================================================
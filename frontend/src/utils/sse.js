@@ -7,9 +7,11 @@
  *
  * Event Types:
  *   - start: Stream has begun
- *   - token: Individual token from LLM
+ *   - tables: Tables sent to the LLM as schema context
+ *   - token: Generated text (one or more LLM tokens)
  *   - sql: Extracted SQL query
- *   - data: Query results (JSON array)
+ *   - data: A batch of query result rows (JSON array, repeated)
+ *   - data_end: Row count and truncation flag for the result
  *   - error: Error message
  *   - end: Stream complete
  */
@@ -28,9 +30,11 @@ const config = {
  * @param {string} message - The user's question
  * @param {Object} callbacks - Event callbacks
  * @param {Function} callbacks.onStart - Called when stream starts
- * @param {Function} callbacks.onToken - Called for each token
+ * @param {Function} callbacks.onTables - Called with the chosen table names
+ * @param {Function} callbacks.onToken - Called with each piece of generated text
  * @param {Function} callbacks.onSql - Called with extracted SQL
- * @param {Function} callbacks.onData - Called with query results
+ * @param {Function} callbacks.onData - Called with all rows received so far
+ * @param {Function} callbacks.onDataEnd - Called with { row_count, truncated }
  * @param {Function} callbacks.onError - Called on error
  * @param {Function} callbacks.onEnd - Called when stream ends
  * @returns {EventSource} The EventSource instance (for cleanup)
@@ -40,6 +44,7 @@ export function streamChat(message, callbacks = {}) {
   const url = `${config.baseUrl}/chat/stream?message=${encodedMessage}`;
 
   const eventSource = new EventSource(url);
+  let rows = [];
 
   eventSource.onmessage = (event) => {
     try {
@@ -49,6 +54,9 @@ export function streamChat(message, callbacks = {}) {
         case "start":
           callbacks.onStart?.();
           break;
+        case "tables":
+          callbacks.onTables?.(data.content);
+          break;
         case "token":
           callbacks.onToken?.(data.content);
           break;
@@ -56,7 +64,12 @@ export function streamChat(message, callbacks = {}) {
           callbacks.onSql?.(data.content);
           break;
         case "data":
-          callbacks.onData?.(data.content);
+          // Results arrive in batches; hand out the accumulated rows
+          rows = rows.concat(data.content);
+          callbacks.onData?.(rows);
+          break;
+        case "data_end":
+          callbacks.onDataEnd?.(data.content);
           break;
         case "error":
           callbacks.onError?.(data.content);